@@ -0,0 +1,103 @@
+import argparse
+import datetime
+import time
+
+import requests
+
+import plan
+from main import FactorialProvider, schedule_range_shifts, schedule_plan
+from runlog import RunLogger
+from transport import Transport
+
+class NullTransport(Transport):
+    """Answers every request with an empty GraphQL success, so only local work is timed"""
+
+    def request(self, method, url, headers=None, json=None, idempotent=False):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"data": {}}'
+        return response
+
+def loop_intents(employee_ids, first_day, last_day, shift_template):
+    """The per-day intents as the scheduling loop and FactorialProvider build them"""
+    intents = []
+    for employee_id in employee_ids:
+        date_obj = first_day
+        while date_obj <= last_day:
+            if date_obj.weekday() < 5:
+                # The loop also looks up calendar.day_name for its "Processing" log line; that is left out here
+                day_str = date_obj.isoformat()
+                for shift_name, start, end in shift_template:
+                    intents.append((employee_id, day_str, shift_name, f"{day_str}T{start}:00.000Z", f"{day_str}T{end}:00.000Z"))
+            date_obj += datetime.timedelta(days=1)
+    return intents
+
+def loop_days(employee_ids, first_day, last_day, shift_template):
+    """(employee, day, planned shifts) as the scheduling loop hands each day to FactorialProvider"""
+    days = []
+    for employee_id in employee_ids:
+        date_obj = first_day
+        while date_obj <= last_day:
+            if date_obj.weekday() < 5:
+                day_str = date_obj.isoformat()
+                days.append((employee_id, day_str, [(shift_name, f"{day_str}T{start}:00.000Z", f"{day_str}T{end}:00.000Z")
+                                                    for shift_name, start, end in shift_template]))
+            date_obj += datetime.timedelta(days=1)
+    return days
+
+def plan_days(employee_ids, first_day, last_day, shift_template, use_numpy):
+    return list(plan.build_plan(employee_ids, first_day, last_day, shift_template, use_numpy=use_numpy).by_day())
+
+def plan_intents(employee_ids, first_day, last_day, shift_template, use_numpy):
+    return [tuple(row) for row in plan.build_plan(employee_ids, first_day, last_day, shift_template, use_numpy=use_numpy).rows()]
+
+def timed(label, function, *args):
+    started = time.perf_counter()
+    value = function(*args)
+    print(f"  {label:<28} {time.perf_counter() - started:8.3f}s")
+    return value
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare plan.py against the per-day scheduling loop")
+    parser.add_argument("--employees", type=int, default=1000, help="Number of employees (default: 1000)")
+    parser.add_argument("--year", type=int, default=2025, help="Year to plan (default: 2025)")
+    parser.add_argument("--run-employees", type=int, default=50, help="Employees in the end-to-end run with a null transport (default: 50)")
+    args = parser.parse_args()
+
+    first_day, last_day = datetime.date(args.year, 1, 1), datetime.date(args.year, 12, 31)
+    template = FactorialProvider.shift_template
+    employee_ids = list(range(1, args.employees + 1))
+    backends = [False] + ([True] if plan.np is not None else [])
+
+    print(f"Building intents for {args.employees} employees over {args.year}:")
+    expected = timed("loop", loop_intents, employee_ids, first_day, last_day, template)
+    for use_numpy in backends:
+        rows = timed(f"plan ({'numpy' if use_numpy else 'array'}) + rows", plan_intents, employee_ids, first_day, last_day,
+                     template, use_numpy)
+        assert rows == expected, "plan rows differ from the loop"
+        timed(f"plan ({'numpy' if use_numpy else 'array'}) build only", plan.build_plan, employee_ids, first_day, last_day,
+              template, (), plan.WEEKDAYS, use_numpy)
+    print(f"  {len(expected)} intents")
+
+    print("\nGrouping them by employee day, as schedule_plan reads them:")
+    expected = timed("loop", loop_days, employee_ids, first_day, last_day, template)
+    for use_numpy in backends:
+        days = timed(f"plan ({'numpy' if use_numpy else 'array'}) + by_day", plan_days, employee_ids, first_day, last_day,
+                     template, use_numpy)
+        assert days == expected, "plan days differ from the loop"
+    print(f"  {len(expected)} employee days")
+
+    print(f"\nScheduling {args.run_employees} employees over {args.year} with a null transport:")
+    provider = FactorialProvider(NullTransport())
+    quiet = RunLogger(print, mode="quiet")
+    run_ids = employee_ids[:args.run_employees]
+
+    def run_loop():
+        for employee_id in run_ids:
+            schedule_range_shifts(provider, employee_id, first_day, last_day, "cookie", logger=quiet)
+
+    timed("schedule_range_shifts", run_loop)
+    for use_numpy in backends:
+        fleet_plan = plan.build_plan(run_ids, first_day, last_day, template, use_numpy=use_numpy)
+        timed(f"schedule_plan ({'numpy' if use_numpy else 'array'})", schedule_plan, provider, fleet_plan,
+              {employee_id: "cookie" for employee_id in run_ids}, quiet)
@@ -0,0 +1,167 @@
+import sqlite3
+import threading
+import datetime
+import json
+import uuid
+
+DEFAULT_DB_PATH = "jobs.db"
+
+class JobStore:
+    """SQLite-backed store of scheduling jobs and their per-day progress.
+
+    Credentials are never persisted: resuming a job requires the caller to
+    supply the cookie/auth token again.
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        # Shared between webapp threads, so every access goes through the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " provider TEXT NOT NULL,"
+                " employee_id INTEGER NOT NULL,"
+                " year INTEGER NOT NULL,"
+                " month INTEGER NOT NULL,"
+                " status TEXT NOT NULL,"
+                " created_at TEXT NOT NULL,"
+                " updated_at TEXT NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS job_days ("
+                " job_id TEXT NOT NULL,"
+                " day TEXT NOT NULL,"
+                " errors TEXT,"
+                " completed_at TEXT NOT NULL,"
+                " PRIMARY KEY (job_id, day))"
+            )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS watermarks ("
+                " provider TEXT NOT NULL,"
+                " employee_id INTEGER NOT NULL,"
+                " day TEXT NOT NULL,"
+                " updated_at TEXT NOT NULL,"
+                " PRIMARY KEY (provider, employee_id))"
+            )
+            # Days confirmed after a day that failed, so the watermark can catch up once the gap is filled
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS confirmed_days ("
+                " provider TEXT NOT NULL,"
+                " employee_id INTEGER NOT NULL,"
+                " day TEXT NOT NULL,"
+                " PRIMARY KEY (provider, employee_id, day))"
+            )
+
+    def create_job(self, provider_type, employee_id, year, month):
+        """Register a new job and return its id"""
+        job_id = uuid.uuid4().hex[:12]
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, ?, ?, ?, 'running', ?, ?)",
+                (job_id, provider_type.lower(), employee_id, year, month, now, now)
+            )
+        return job_id
+
+    def get_job(self, job_id):
+        """Return the job parameters as a dict, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def list_unfinished_jobs(self):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM jobs WHERE status != 'finished' ORDER BY created_at"
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def checkpoint(self, job_id):
+        if self.get_job(job_id) is None:
+            raise ValueError(f"Unknown job id: {job_id}")
+        return JobCheckpoint(self, job_id)
+
+    def get_watermark(self, provider_type, employee_id):
+        """Last day confirmed as scheduled for an employee, or None"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT day FROM watermarks WHERE provider = ? AND employee_id = ?",
+                (provider_type.lower(), employee_id)
+            ).fetchone()
+        return datetime.date.fromisoformat(row["day"]) if row else None
+
+    def set_watermark(self, provider_type, employee_id, day):
+        """Move the watermark; confirmed days it now covers are forgotten"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?, ?)",
+                (provider_type.lower(), employee_id, day.isoformat(), _now())
+            )
+            self._conn.execute(
+                "DELETE FROM confirmed_days WHERE provider = ? AND employee_id = ? AND day <= ?",
+                (provider_type.lower(), employee_id, day.isoformat())
+            )
+
+    def confirm_day(self, provider_type, employee_id, day):
+        """Remember a day scheduled past the watermark while an earlier day is still missing"""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO confirmed_days VALUES (?, ?, ?)",
+                (provider_type.lower(), employee_id, day.isoformat())
+            )
+
+    def confirmed_days(self, provider_type, employee_id):
+        """Days after the watermark already confirmed, as date objects"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day FROM confirmed_days WHERE provider = ? AND employee_id = ?",
+                (provider_type.lower(), employee_id)
+            ).fetchall()
+        return {datetime.date.fromisoformat(row["day"]) for row in rows}
+
+    def _record_day(self, job_id, day, errors):
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_days VALUES (?, ?, ?, ?)",
+                (job_id, day, json.dumps(errors) if errors else None, now)
+            )
+            self._conn.execute("UPDATE jobs SET updated_at = ? WHERE job_id = ?", (now, job_id))
+
+    def _completed_days(self, job_id):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT day, errors FROM job_days WHERE job_id = ?", (job_id,)
+            ).fetchall()
+        return {row["day"]: json.loads(row["errors"]) if row["errors"] else None for row in rows}
+
+    def _set_status(self, job_id, status):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE job_id = ?",
+                (status, _now(), job_id)
+            )
+
+class JobCheckpoint:
+    """Per-day progress of a single job, as consumed by schedule_month_shifts"""
+
+    def __init__(self, store, job_id):
+        self.store = store
+        self.job_id = job_id
+
+    def completed_days(self):
+        """Days already processed, mapped to their errors (None if they succeeded)"""
+        return self.store._completed_days(self.job_id)
+
+    def record_day(self, day, errors):
+        self.store._record_day(self.job_id, day, errors)
+
+    def finish(self):
+        self.store._set_status(self.job_id, "finished")
+
+def _now():
+    return datetime.datetime.now().isoformat(timespec="seconds")
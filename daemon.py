@@ -0,0 +1,100 @@
+import datetime
+import re
+import threading
+
+from main import get_provider, get_employee_configs, schedule_range_shifts
+
+# Rejections meaning the shift is already there, e.g. a retried day whose other shifts went through
+_ALREADY_REGISTERED = re.compile(r"overlap|already|solapa|ya existe", re.IGNORECASE)
+
+def _already_registered(errors):
+    return all(_ALREADY_REGISTERED.search(str(message)) for message in errors.values())
+
+class WatermarkCheckpoint:
+    """Checkpoint that advances an employee's watermark as days are confirmed.
+
+    The watermark moves over the unbroken run of confirmed days. Days
+    confirmed after a failed one are stored, skipped by the next runs, and
+    covered by the watermark once the failed day goes through, so only the
+    failed days are posted again. Shifts rejected as already registered
+    count as confirmed.
+    """
+
+    def __init__(self, store, provider_type, employee_id, last_day):
+        self.store = store
+        self.provider_type = provider_type
+        self.employee_id = employee_id
+        self.last_day = last_day
+        self.job_id = f"watermark:{provider_type}:{employee_id}"
+        self.blocked = False
+
+    def completed_days(self):
+        return {day.isoformat(): None for day in self.store.confirmed_days(self.provider_type, self.employee_id)}
+
+    def record_day(self, day, errors):
+        if errors and not _already_registered(errors):
+            self.blocked = True
+        elif self.blocked:
+            self.store.confirm_day(self.provider_type, self.employee_id, datetime.date.fromisoformat(day))
+        else:
+            self.store.set_watermark(self.provider_type, self.employee_id, datetime.date.fromisoformat(day))
+
+    def finish(self):
+        # Days in the range that needed no work (already complete, weekends) are confirmed too
+        if not self.blocked:
+            self.store.set_watermark(self.provider_type, self.employee_id, self.last_day)
+
+def fill_since_watermark(provider, provider_type, employee_id, auth_data, store, logger=print, stop_event=None, today=None):
+    """Schedule only the days after the employee's watermark, up to today"""
+    today = today or datetime.date.today()
+    watermark = store.get_watermark(provider_type, employee_id)
+    # Without a watermark, start from the beginning of the current month
+    first_day = watermark + datetime.timedelta(days=1) if watermark else today.replace(day=1)
+    if first_day > today:
+        logger(f"Employee {employee_id} is up to date (watermark {watermark.isoformat()})")
+        return {}
+
+    logger(f"Employee {employee_id}: filling {first_day.isoformat()} - {today.isoformat()}")
+    checkpoint = WatermarkCheckpoint(store, provider_type, employee_id, today)
+    failed_days = schedule_range_shifts(provider, employee_id, first_day, today, auth_data,
+                                        logger=logger, stop_event=stop_event, checkpoint=checkpoint)
+    return {day: errors for day, errors in failed_days.items() if not _already_registered(errors)}
+
+def next_run_time(now, interval_minutes=None, at=None):
+    """Next time the daemon should run: every interval_minutes, or daily at HH:MM"""
+    if at:
+        hour, minute = (int(part) for part in at.split(":"))
+        run_at = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if run_at <= now:
+            run_at += datetime.timedelta(days=1)
+        return run_at
+    return now + datetime.timedelta(minutes=interval_minutes or 24 * 60)
+
+def run_daemon(config, store, interval_minutes=None, at=None, logger=print, stop_event=None, transport=None):
+    """Fill new days for every configured employee on a schedule until stopped"""
+    stop_event = stop_event or threading.Event()
+
+    # Providers (and their HTTP sessions) are created once and reused across runs
+    workers = []
+    for employee in get_employee_configs(config):
+        provider_type = employee.get("provider", "factorial")
+        provider, auth_data = get_provider(provider_type, employee, transport)
+        workers.append((provider, provider_type.lower(), employee["employee_id"], auth_data))
+
+    logger(f"Daemon started for {len(workers)} employee(s)")
+    while not stop_event.is_set():
+        for provider, provider_type, employee_id, auth_data in workers:
+            if stop_event.is_set():
+                break
+            try:
+                failed_days = fill_since_watermark(provider, provider_type, employee_id, auth_data, store,
+                                                   logger=logger, stop_event=stop_event)
+                if failed_days:
+                    logger(f"Employee {employee_id}: {len(failed_days)} day(s) failed and will be retried next run")
+            except Exception as e:
+                logger(f"Employee {employee_id}: error during run: {e}")
+
+        run_at = next_run_time(datetime.datetime.now(), interval_minutes, at)
+        logger(f"Next run at {run_at.isoformat(timespec='minutes')}")
+        stop_event.wait((run_at - datetime.datetime.now()).total_seconds())
+    logger("Daemon stopped.")
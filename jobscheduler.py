@@ -0,0 +1,95 @@
+import itertools
+import threading
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+# Lower runs first
+PRIORITIES = {INTERACTIVE: 0, BULK: 1}
+
+class JobScheduler:
+    """Runs background jobs on at most max_workers threads at a time.
+
+    Interactive jobs always go before bulk ones, and bulk jobs never take the
+    last reserved_interactive slots, so a single-month request starts right
+    away even while backfills are running. Within a class, users take turns:
+    the user with the fewest running and earlier queued jobs goes first,
+    then submission order.
+    """
+
+    def __init__(self, max_workers=4, reserved_interactive=1):
+        self.max_workers = max(1, max_workers)
+        self.reserved_interactive = max(0, min(reserved_interactive, self.max_workers - 1))
+        self._lock = threading.Lock()
+        self._queued = []
+        self._running = {}
+        self._running_total = 0
+        self._seq = itertools.count()
+
+    def submit(self, run, user, priority=INTERACTIVE, on_queue=None):
+        """Queue run() for user; on_queue(position) is called whenever its place in the queue changes (1 = next)"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority: {priority}")
+        entry = {"run": run, "user": user, "priority": priority, "seq": next(self._seq),
+                 "on_queue": on_queue, "position": None}
+        with self._lock:
+            self._queued.append(entry)
+            self._dispatch()
+            changed = self._positions()
+        _notify(changed)
+
+    def snapshot(self):
+        with self._lock:
+            queued = {priority: 0 for priority in PRIORITIES}
+            for entry in self._queued:
+                queued[entry["priority"]] += 1
+            return {"running": self._running_total, "queued": queued, "max_workers": self.max_workers}
+
+    def _order(self):
+        # Each user's n-th waiting job ranks behind every other user's (n-1)-th, per class
+        turns = dict(self._running)
+        ranked = []
+        for entry in self._queued:
+            turn = turns.get(entry["user"], 0)
+            turns[entry["user"]] = turn + 1
+            ranked.append(((PRIORITIES[entry["priority"]], turn, entry["seq"]), entry))
+        ranked.sort(key=lambda item: item[0])
+        return [entry for _, entry in ranked]
+
+    def _dispatch(self):
+        while self._queued and self._running_total < self.max_workers:
+            entry = self._order()[0]
+            if entry["priority"] != INTERACTIVE and self._running_total >= self.max_workers - self.reserved_interactive:
+                return
+            self._queued.remove(entry)
+            self._running[entry["user"]] = self._running.get(entry["user"], 0) + 1
+            self._running_total += 1
+            threading.Thread(target=self._run, args=(entry,)).start()
+
+    def _positions(self):
+        changed = []
+        for position, entry in enumerate(self._order(), 1):
+            if entry["position"] != position:
+                entry["position"] = position
+                if entry["on_queue"] is not None:
+                    changed.append((entry["on_queue"], position))
+        return changed
+
+    def _run(self, entry):
+        try:
+            entry["run"]()
+        finally:
+            with self._lock:
+                # The freed slot is handed out while this job still counts for its user,
+                # so another user's waiting job goes next, as its reported position said
+                self._running_total -= 1
+                self._dispatch()
+                self._running[entry["user"]] -= 1
+                if not self._running[entry["user"]]:
+                    del self._running[entry["user"]]
+                changed = self._positions()
+            _notify(changed)
+
+def _notify(changed):
+    # Called outside the scheduler lock, so a callback can never hold up dispatching
+    for on_queue, position in changed:
+        on_queue(position)
@@ -1,11 +1,20 @@
 import requests
 import json
+import hashlib
 import calendar
 import datetime
 import sys
+import time
 import argparse
 from abc import ABC, abstractmethod
 
+from checkpoint import JobStore, DEFAULT_DB_PATH
+from plan import build_plan
+from transport import HttpTransport, HedgePolicy, get_transport, call_limits, counting_hedges, deadline_after, DEFAULT_TIMEOUT
+from statuscache import MonthStatusCache
+from runlog import RunLogger, as_run_logger, MODES
+from results import success_result, failure_result, shift_event, retryable_failures, save_results, load_results
+
 def load_config():
     try:
         with open('config.json', 'r') as f:
@@ -18,39 +27,95 @@ def load_config():
         sys.exit(1)
 
 class TimeProvider(ABC):
+    # (shift, clock in "HH:MM", clock out "HH:MM") of a regular working day, in UTC
+    shift_template = ()
+
+    def __init__(self, transport=None):
+        # The default HttpTransport reuses one session, keeping connections warm between calls and runs
+        self.transport = transport if transport is not None else HttpTransport()
+
     @abstractmethod
-    def schedule_day_shifts(self, employee_id, day, auth_data, logger=print):
-        """Schedule shifts for a single day"""
+    def schedule_day_shifts(self, employee_id, day, auth_data, logger=print, results=None, shifts=None, events=None):
+        """Schedule shifts for a single day.
+
+        A ShiftResult is appended to results (if given) for every shift submitted,
+        and events (if given) is called with a shift event before and after each one;
+        shifts optionally restricts which shift names are submitted.
+        """
         pass
 
+    def schedule_planned_shifts(self, employee_id, day, planned, auth_data, logger=print, results=None, events=None):
+        """Schedule precomputed (shift, clock_in, clock_out) rows of one day, e.g. from a SchedulePlan.
+
+        Providers with fixed payloads only use the shift names.
+        """
+        return self.schedule_day_shifts(employee_id, day, auth_data, logger, results=results,
+                                        shifts={shift_name for shift_name, _, _ in planned}, events=events)
+
+    def verify_range(self, employee_id, first_day, last_day, auth_data):
+        """Read back the registered minutes of the range in one request.
+
+        Returns {day: (registered_minutes, planned_minutes)} for the days that
+        are still incomplete, or None if the provider cannot verify.
+        """
+        return None
+
+def _shift_started(events, day, shift_name):
+    if events is not None:
+        events({"type": "shift", "status": "started", "day": day, "shift": shift_name})
+
+def _report_shift(shift_result, results, events):
+    if results is not None:
+        results.append(shift_result)
+    if events is not None:
+        events(shift_event(shift_result))
+
+def _error_details(error):
+    """Status code and error class of a failed request, for ShiftResult records"""
+    response = getattr(error, "response", None)
+    return {
+        "error": str(error),
+        "error_class": type(error).__name__,
+        "status_code": response.status_code if response is not None else None
+    }
+
 class FactorialProvider(TimeProvider):
-    def schedule_day_shifts(self, employee_id, day, auth_data, logger=print):
-        cookie = auth_data
-        shifts = {
-            "morning": {
-                "clock_in": f"{day}T09:00:00.000Z",
-                "clock_out": f"{day}T13:00:00.000Z"
-            },
-            "lunch_break": {
-                "clock_in": f"{day}T13:00:00.000Z",
-                "clock_out": f"{day}T14:00:00.000Z"
-            },
-            "afternoon": {
-                "clock_in": f"{day}T15:00:00.000Z",
-                "clock_out": f"{day}T18:00:00.000Z"
-            }
-        }
+    name = "factorial"
+    # (shift, clock in, clock out) submitted for every weekday, in UTC
+    shift_template = (
+        ("morning", "09:00", "13:00"),
+        ("lunch_break", "13:00", "14:00"),
+        ("afternoon", "15:00", "18:00"),
+    )
+    # morning + lunch_break + afternoon, all submitted as workable time
+    planned_minutes = 480
+
+    def schedule_day_shifts(self, employee_id, day, auth_data, logger=print, results=None, shifts=None, events=None):
+        planned = [(shift_name, f"{day}T{start}:00.000Z", f"{day}T{end}:00.000Z")
+                   for shift_name, start, end in self.shift_template
+                   if shifts is None or shift_name in shifts]
+        return self.schedule_planned_shifts(employee_id, day, planned, auth_data, logger, results, events)
 
+    def schedule_planned_shifts(self, employee_id, day, planned, auth_data, logger=print, results=None, events=None):
+        cookie = auth_data
+        log = as_run_logger(logger)
         day_errors = {}
-        logger(f"Scheduling shifts for {day}:")
-        for shift_name, times in shifts.items():
+        log.debug("Scheduling shifts for %s:", day)
+        for shift_name, clock_in, clock_out in planned:
             # Extract HH:MM only from the ISO timestamps
-            start = times["clock_in"].split("T")[1][:5]
-            end = times["clock_out"].split("T")[1][:5]
+            start = clock_in.split("T")[1][:5]
+            end = clock_out.split("T")[1][:5]
             # (Optional) Log the shift info in a short format.
-            logger(f"  {shift_name}: {start} - {end}")
-            result = self._create_attendance_shift(employee_id, day, times["clock_in"], times["clock_out"], cookie)
-            if result.get("data"):
+            log.debug("  %s: %s - %s", shift_name, start, end, key="shift")
+            _shift_started(events, day, shift_name)
+            result = self._create_attendance_shift(employee_id, day, clock_in, clock_out, cookie)
+            shift_result = success_result(day, shift_name, self.name, 200)
+            if result.get("error"):
+                day_errors[shift_name] = f"{start} - {end}: {result['error']}"
+                log.warning("  Error for %s: %s", shift_name, day_errors[shift_name])
+                shift_result = failure_result(day, shift_name, self.name, result["status_code"],
+                                              result["error_class"], result["error"])
+            elif result.get("data"):
                 am = result["data"].get("attendanceMutations", {})
                 cas = am.get("createAttendanceShift", {})
                 errors = cas.get("errors")
@@ -58,14 +123,17 @@ class FactorialProvider(TimeProvider):
                     # Collect errors for this shift.
                     msg_list = [error.get("messages", ["Unknown error"])[0] for error in errors]
                     day_errors[shift_name] = f"{start} - {end}: " + " | ".join(msg_list)
-                    logger(f"  Error for {shift_name}: {day_errors[shift_name]}")
-        logger(f"Finished scheduling for {day}\n")
+                    log.warning("  Error for %s: %s", shift_name, day_errors[shift_name])
+                    # Rejected by Factorial's validation (e.g. overlapping shifts): not retryable
+                    shift_result = failure_result(day, shift_name, self.name, 200, "MutationError",
+                                                  " | ".join(msg_list))
+            _report_shift(shift_result, results, events)
+        log.debug("Finished scheduling for %s\n", day)
         # Return errors dictionary if there were any, otherwise return None.
         return day_errors if day_errors else None
 
-    def _create_attendance_shift(self, employee_id, date, clock_in, clock_out, cookie):
-        url = 'https://api.factorialhr.com/graphql?CreateAttendanceShift=null'
-        headers = {
+    def _headers(self, cookie):
+        return {
             "Content-Type": "application/json",
             "Accept-Encoding": "gzip, deflate, br",
             "Pragma": "no-cache",
@@ -85,6 +153,10 @@ class FactorialProvider(TimeProvider):
             "x-factorial-origin": "web"
         }
 
+    def _create_attendance_shift(self, employee_id, date, clock_in, clock_out, cookie):
+        url = 'https://api.factorialhr.com/graphql?CreateAttendanceShift=null'
+        headers = self._headers(cookie)
+
         payload = {
             "operationName": "CreateAttendanceShift",
             "variables": {
@@ -245,29 +317,98 @@ class FactorialProvider(TimeProvider):
         }
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.transport.post(url, json=payload, headers=headers)
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
+            return _error_details(e)
+
+    def verify_range(self, employee_id, first_day, last_day, auth_data):
+        """Worked minutes per weekday from a single attendanceWorkedTimes query, compared to the submitted plan"""
+        last_day = min(last_day, datetime.date.today())
+        if first_day > last_day:
+            return {}
+        url = 'https://api.factorialhr.com/graphql?VerifyWorkedTimes=null'
+        payload = {
+            "operationName": "VerifyWorkedTimes",
+            "variables": {
+                "employeeIds": [employee_id],
+                "startOn": first_day.isoformat(),
+                "endOn": last_day.isoformat()
+            },
+            "query": (
+                "query VerifyWorkedTimes($employeeIds: [Int!], $startOn: ISO8601Date!, $endOn: ISO8601Date!) {\n"
+                "  employees {\n"
+                "    employees(ids: $employeeIds) {\n"
+                "      id\n"
+                "      attendanceWorkedTimesConnection(endOn: $endOn, startOn: $startOn) {\n"
+                "        nodes {\n"
+                "          date\n"
+                "          minutes\n"
+                "          __typename\n"
+                "        }\n"
+                "        __typename\n"
+                "      }\n"
+                "      __typename\n"
+                "    }\n"
+                "    __typename\n"
+                "  }\n"
+                "}"
+            )
+        }
+        # A read-only query, so it may be hedged even though it is a POST
+        response = self.transport.post(url, json=payload, headers=self._headers(auth_data), idempotent=True)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("errors"):
+            raise ValueError(" | ".join(error.get("message", "Unknown error") for error in body["errors"]))
+        employees = ((body.get("data") or {}).get("employees") or {}).get("employees") or []
+        nodes = employees[0]["attendanceWorkedTimesConnection"]["nodes"] if employees else []
+        worked = {}
+        for node in nodes:
+            worked[node["date"]] = worked.get(node["date"], 0) + (node.get("minutes") or 0)
+
+        incomplete = {}
+        date_obj = first_day
+        while date_obj <= last_day:
+            day_str = date_obj.isoformat()
+            if date_obj.weekday() < 5 and worked.get(day_str, 0) < self.planned_minutes:
+                incomplete[day_str] = (worked.get(day_str, 0), self.planned_minutes)
+            date_obj += datetime.timedelta(days=1)
+        return incomplete
 
 class EndaliaProvider(TimeProvider):
+    name = "endalia"
+    # Submitted as one working day with an 11:00-12:00 lunch break
+    shift_template = (("work_day", "07:00", "16:00"),)
+
+    def __init__(self, transport=None, status_cache=None):
+        super().__init__(transport)
+        self.status_cache = status_cache if status_cache is not None else month_status_cache
+
+    def _cache_identity(self, auth_token):
+        # The status endpoint (/me) answers for the token's owner, so the token alone identifies
+        # the entry: /status, runs and check_missing_days share it, and writes clear it for all of them
+        return hashlib.sha256(auth_token.encode("utf-8")).hexdigest()
+
     def check_missing_days(self, year, month, auth_token, logger=print):
         """Check which days in the month need to be scheduled (missing or incomplete)"""
         # Get first and last day of the month
         first_day = datetime.date(year, month, 1)
         last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
         
-        # Don't check days in the future - Endalia doesn't allow scheduling future dates
-        today = datetime.date.today()
-        if last_day > today:
-            last_day = today
-            logger(f"Limiting check to today ({today.isoformat()}) - cannot schedule future dates")
-        
         # If the entire month is in the future, return empty list
-        if first_day > today:
-            logger(f"Month {year}-{month:02d} is in the future - no days to schedule")
+        if first_day > datetime.date.today():
+            as_run_logger(logger).info("Month %d-%02d is in the future - no days to schedule", year, month)
             return []
+        return self.check_missing_range(first_day, last_day, auth_token, logger)
+
+    def fetch_day_status(self, first_day, last_day, auth_token, use_cache=True):
+        """Registered/planned minutes per day in the range, served from the status cache when fresh"""
+        key = (self.name, self._cache_identity(auth_token), first_day.isoformat(), last_day.isoformat())
+        days = self.status_cache.get(key) if use_cache else None
+        if days is not None:
+            return days
         
         url = f'https://end03time.endaliahr.com/api/workingdayregisters/me/{first_day.isoformat()}/{last_day.isoformat()}'
         headers = {
@@ -276,14 +417,32 @@ class EndaliaProvider(TimeProvider):
             "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/18.5 Safari/605.1.15"
         }
         
+        # Read-only, so it may be hedged when the transport is configured to
+        response = self.transport.get(url, headers=headers, idempotent=True)
+        response.raise_for_status()
+        days = response.json().get('Days', [])
+        self.status_cache.put(key, days)
+        return days
+
+    def check_missing_range(self, first_day, last_day, auth_token, logger=print):
+        """Check which days between first_day and last_day (inclusive) need to be scheduled"""
+        log = as_run_logger(logger)
+        # Don't check days in the future - Endalia doesn't allow scheduling future dates
+        today = datetime.date.today()
+        if last_day > today:
+            last_day = today
+            log.info("Limiting check to today (%s) - cannot schedule future dates", today)
+        
+        if first_day > last_day:
+            log.info("Range %s - %s is in the future - no days to schedule", first_day, last_day)
+            return []
+        
         try:
-            response = requests.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+            days = self.fetch_day_status(first_day, last_day, auth_token)
             
             missing_days = []
-            if 'Days' in data:
-                for day_info in data['Days']:
+            if days:
+                for day_info in days:
                     register_minutes = day_info.get('RegisterMinutes', 0)
                     planned_minutes = day_info.get('PlannedMinutes', 0)
                     day_str = day_info.get('Day', '')
@@ -291,36 +450,53 @@ class EndaliaProvider(TimeProvider):
                     # Parse the day string to check if it's not in the future
                     day_date = datetime.date.fromisoformat(day_str)
                     if day_date > today:
-                        logger(f"Skipping future date {day_str}")
+                        log.debug("Skipping future date %s", day_str)
                         continue
                     
                     # If register minutes don't match planned minutes, the day needs to be scheduled
                     if register_minutes != planned_minutes and planned_minutes > 0:
                         missing_days.append(day_str)
-                        logger(f"Day {day_str} needs scheduling: {register_minutes}/{planned_minutes} minutes")
+                        log.info("Day %s needs scheduling: %s/%s minutes", day_str, register_minutes, planned_minutes)
                     elif register_minutes == planned_minutes and planned_minutes > 0:
-                        logger(f"Day {day_str} already scheduled: {register_minutes}/{planned_minutes} minutes")
+                        log.debug("Day %s already scheduled: %s/%s minutes", day_str, register_minutes, planned_minutes,
+                                  key="already_scheduled")
             
             return missing_days
             
         except requests.exceptions.RequestException as e:
-            logger(f"Error checking existing days: {e}")
+            log.warning("Error checking existing days: %s", e)
             # If we can't check, assume all workdays need scheduling (but only up to today)
             missing_days = []
-            today = datetime.date.today()
-            num_days = calendar.monthrange(year, month)[1]
             
-            for day in range(1, num_days + 1):
-                date_obj = datetime.date(year, month, day)
-                # Only include weekdays that are not in the future
-                if date_obj.weekday() < 5 and date_obj <= today:
+            date_obj = first_day
+            while date_obj <= last_day:
+                # Only include weekdays (last_day is already capped at today)
+                if date_obj.weekday() < 5:
                     missing_days.append(date_obj.isoformat())
+                date_obj += datetime.timedelta(days=1)
             
-            logger(f"Fallback: assuming {len(missing_days)} workdays need scheduling (up to today)")
+            log.warning("Fallback: assuming %d workdays need scheduling (up to today)", len(missing_days))
             return missing_days
 
-    def schedule_day_shifts(self, employee_id, day, auth_data, logger=print):
+    def verify_range(self, employee_id, first_day, last_day, auth_data):
+        """Registered vs planned minutes read fresh from workingdayregisters/me, bypassing the status cache"""
+        last_day = min(last_day, datetime.date.today())
+        if first_day > last_day:
+            return {}
+        days = self.fetch_day_status(first_day, last_day, auth_data, use_cache=False)
+        incomplete = {}
+        for day_info in days:
+            registered = day_info.get('RegisterMinutes', 0)
+            planned = day_info.get('PlannedMinutes', 0)
+            if planned > 0 and registered != planned:
+                incomplete[day_info.get('Day', '')] = (registered, planned)
+        return incomplete
+
+    def schedule_day_shifts(self, employee_id, day, auth_data, logger=print, results=None, shifts=None, events=None):
         auth_token = auth_data
+        # Endalia registers the whole day as a single "work_day" shift
+        if shifts is not None and "work_day" not in shifts:
+            return None
         
         # Convert day string to datetime for processing
         day_dt = datetime.datetime.fromisoformat(day)
@@ -331,9 +507,11 @@ class EndaliaProvider(TimeProvider):
         lunch_start = day_dt.replace(hour=11, minute=0, second=0, microsecond=0)
         lunch_end = day_dt.replace(hour=12, minute=0, second=0, microsecond=0)
         
-        logger(f"Scheduling work day for {day}:")
-        logger(f"  Work time: 09:00 - 18:00")
-        logger(f"  Lunch break: 13:00 - 14:00")
+        log = as_run_logger(logger)
+        log.debug("Scheduling work day for %s:", day)
+        log.debug("  Work time: 09:00 - 18:00", key="shift")
+        log.debug("  Lunch break: 13:00 - 14:00", key="shift")
+        _shift_started(events, day, "work_day")
         
         result = self._create_working_day(
             employee_id, 
@@ -344,13 +522,18 @@ class EndaliaProvider(TimeProvider):
             lunch_end.isoformat() + "Z",
             auth_token
         )
+        # Whatever the outcome, the cached status of this day may now be stale
+        self.status_cache.invalidate_day(self.name, self._cache_identity(auth_token), day)
         
         if result.get("error"):
             error_msg = f"09:00 - 18:00: {result['error']}"
-            logger(f"  Error: {error_msg}")
+            log.warning("  Error: %s", error_msg)
+            _report_shift(failure_result(day, "work_day", self.name, result["status_code"],
+                                         result["error_class"], result["error"]), results, events)
             return {"work_day": error_msg}
         
-        logger(f"Finished scheduling for {day}\n")
+        _report_shift(success_result(day, "work_day", self.name, result.get("status_code", 200)), results, events)
+        log.debug("Finished scheduling for %s\n", day)
         return None
 
     def _create_working_day(self, employee_id, day, work_start, work_end, lunch_start, lunch_end, auth_token):
@@ -397,7 +580,7 @@ class EndaliaProvider(TimeProvider):
         }
 
         try:
-            response = requests.post(url, json=payload, headers=headers)
+            response = self.transport.post(url, json=payload, headers=headers)
             response.raise_for_status()
             
             # Check if response has content before trying to parse JSON
@@ -405,59 +588,299 @@ class EndaliaProvider(TimeProvider):
                 return response.json()
             else:
                 # Empty response body indicates success for Endalia API
-                return {"status": "success", "message": "Working day created successfully"}
+                return {"status": "success", "message": "Working day created successfully",
+                        "status_code": response.status_code}
         except requests.exceptions.RequestException as e:
-            return {"error": str(e)}
+            return _error_details(e)
+
+# Day statuses shared by every provider instance in the process (e.g. across webapp requests)
+month_status_cache = MonthStatusCache(ttl=300, max_entries=1024)
 
-def get_provider(provider_type, config):
+def get_provider(provider_type, config, transport=None):
     """Factory function to get the appropriate time provider"""
     if provider_type.lower() == "factorial":
-        return FactorialProvider(), config.get("cookie")
+        return FactorialProvider(transport), config.get("cookie")
     elif provider_type.lower() == "endalia":
-        return EndaliaProvider(), config.get("auth_token")
+        return EndaliaProvider(transport), config.get("auth_token")
     else:
         raise ValueError(f"Unknown provider type: {provider_type}")
 
-def schedule_month_shifts(provider, employee_id, year, month, auth_data, logger=print, stop_event=None):
-    num_days = calendar.monthrange(year, month)[1]
+def get_employee_configs(config):
+    """Employees to schedule: the "employees" list if present, otherwise the top-level entry"""
+    if config.get("employees"):
+        # Entries inherit the top-level provider/credentials unless they override them
+        defaults = {key: value for key, value in config.items() if key != "employees"}
+        return [{**defaults, **employee} for employee in config["employees"]]
+    return [config]
+
+def schedule_month_shifts(provider, employee_id, year, month, auth_data, logger=print, stop_event=None, checkpoint=None, results=None, deadline=None, events=None, verify=False):
+    """Schedule a month; with verify, read the month back afterwards and report the days still incomplete as failed"""
+    log = as_run_logger(logger)
+    log.summary("Starting scheduling shifts for %d-%02d...\n", year, month)
+    first_day = datetime.date(year, month, 1)
+    last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
+    failed_days = schedule_range_shifts(provider, employee_id, first_day, last_day, auth_data,
+                                        logger=log, stop_event=stop_event, checkpoint=checkpoint, results=results,
+                                        deadline=deadline, events=events, verify=verify)
+    log.summary("Finished scheduling the month: %d days with errors.\n", len(failed_days))
+    return failed_days
+
+# Error key of the days a verification found incomplete, in the returned failed days
+VERIFICATION_ERROR = "verification"
+
+def verify_range_shifts(provider, employee_id, first_day, last_day, auth_data, logger=print, stop_event=None, deadline=None, events=None):
+    """One bulk read of the range after a run; returns {day: (registered, planned)} of incomplete days, or None"""
+    log = as_run_logger(logger)
+    log.info("Verifying registered minutes for %s - %s...", first_day, last_day)
+    try:
+        with call_limits(stop_event, deadline):
+            incomplete = provider.verify_range(employee_id, first_day, last_day, auth_data)
+    except (requests.exceptions.RequestException, ValueError, KeyError) as e:
+        log.warning("Verification failed: %s", e)
+        _verification_event(events, None, str(e))
+        return None
+    if incomplete is None:
+        log.warning("Verification is not supported for %s", provider.name)
+        return None
+    if incomplete:
+        log.summary("Verification: %d days still incomplete", len(incomplete))
+        for day_str, (registered, planned) in sorted(incomplete.items()):
+            log.warning("  %s: %s/%s minutes", day_str, registered, planned)
+    else:
+        log.summary("Verification: every day is complete")
+    _verification_event(events, incomplete)
+    return incomplete
+
+def _verification_event(events, incomplete, error=None):
+    if events is not None:
+        event = {"type": "verification", "incomplete": {day: {"registered": registered, "planned": planned}
+                                                        for day, (registered, planned) in sorted((incomplete or {}).items())}}
+        if error is not None:
+            event["error"] = error
+        events(event)
+
+def _interrupted(stop_event, deadline):
+    return (stop_event is not None and stop_event.is_set()) or (deadline is not None and time.monotonic() >= deadline)
+
+def _stop_requested(stop_event, deadline, logger):
+    """Check between days whether the job was stopped or ran past its deadline"""
+    if stop_event is not None and stop_event.is_set():
+        logger.warning("Process stopped by user.\n")
+        return True
+    if deadline is not None and time.monotonic() >= deadline:
+        logger.warning("Job deadline reached, stopping.\n")
+        return True
+    return False
+
+def schedule_range_shifts(provider, employee_id, first_day, last_day, auth_data, logger=print, stop_event=None, checkpoint=None, results=None, deadline=None, events=None, verify=False):
+    """Schedule every pending day between first_day and last_day (inclusive).
+
+    stop_event and deadline (a time.monotonic() value) also apply to the
+    provider's in-flight requests, not only between days. events (if given)
+    is called with a dict for every day and shift as it starts and ends, and
+    finally with a summary. With verify, the range is read back before the
+    summary (see verify_range_shifts) and incomplete days are returned with
+    a VERIFICATION_ERROR entry.
+    """
+    log = as_run_logger(logger)
+    with call_limits(stop_event, deadline), counting_hedges() as hedges:
+        failed_days = _schedule_range_shifts(provider, employee_id, first_day, last_day, auth_data, log,
+                                             stop_event, checkpoint, results, deadline, events, verify)
+    _log_hedges(hedges.snapshot(), log)
+    return failed_days
+
+def _log_hedges(counts, logger):
+    if counts["reads"]:
+        logger.summary("Hedged reads: %d of %d status reads hedged, %d answered first by the hedge",
+                       counts["hedges_fired"], counts["reads"], counts["hedge_wins"])
+
+def _day_event(events, status, day, **details):
+    if events is not None:
+        events({"type": "day", "status": status, "day": day, **details})
+
+def _run_day(provider, employee_id, day_str, auth_data, logger, results, events, shifts=None):
+    """Schedule one day through the provider, reporting day events around it"""
+    _day_event(events, "started", day_str)
+    errors = provider.schedule_day_shifts(employee_id, day_str, auth_data, logger, results=results, shifts=shifts, events=events)
+    _day_event(events, "failed" if errors else "succeeded", day_str)
+    return errors
+
+def _summary_event(events, failed_days, processed, stopped, incomplete=None):
+    if events is not None:
+        event = {"type": "summary", "days_processed": processed, "days_failed": len(failed_days),
+                 "failed_days": sorted(failed_days), "stopped": stopped}
+        if incomplete is not None:
+            event["incomplete_days"] = sorted(incomplete)
+        events(event)
+
+def _schedule_range_shifts(provider, employee_id, first_day, last_day, auth_data, logger, stop_event, checkpoint, results, deadline, events, verify=False):
     failed_days = {}
-    logger(f"Starting scheduling shifts for {year}-{month:02d}...\n")
+    processed = 0
+
+    # When resuming a checkpointed job, skip the days it already processed
+    completed_days = {}
+    if checkpoint is not None:
+        completed_days = checkpoint.completed_days()
+        failed_days.update({day: errors for day, errors in completed_days.items() if errors})
+        if completed_days:
+            logger.summary("Resuming job %s: %d days already processed\n", checkpoint.job_id, len(completed_days))
+    stopped = False
     
     # For Endalia, check which days are missing first
     if isinstance(provider, EndaliaProvider):
-        logger("Checking which days need to be scheduled...")
-        missing_days = provider.check_missing_days(year, month, auth_data, logger)
-        logger(f"Found {len(missing_days)} days that need scheduling\n")
+        logger.info("Checking which days need to be scheduled...")
+        missing_days = provider.check_missing_range(first_day, last_day, auth_data, logger)
+        logger.summary("Found %d days that need scheduling\n", len(missing_days))
         
         # Only process missing days
         for day_str in missing_days:
-            if stop_event is not None and stop_event.is_set():
-                logger("Process stopped by user.\n")
+            if _stop_requested(stop_event, deadline, logger):
+                stopped = True
                 break
+            if day_str in completed_days:
+                logger.debug("Skipping %s - already processed", day_str, key="already_processed")
+                _day_event(events, "skipped", day_str, reason="already processed")
+                continue
             date_obj = datetime.date.fromisoformat(day_str)
-            logger(f"Processing {day_str} ({date_obj.strftime('%A')}):")
-            errors = provider.schedule_day_shifts(employee_id, day_str, auth_data, logger)
+            logger.info("Processing %s (%s):", day_str, calendar.day_name[date_obj.weekday()])
+            errors = _run_day(provider, employee_id, day_str, auth_data, logger, results, events)
+            processed += 1
             if errors:
                 failed_days[day_str] = errors
+            # A day cut short by a stop or the deadline is left for the resumed run
+            if checkpoint is not None and not _interrupted(stop_event, deadline):
+                checkpoint.record_day(day_str, errors)
     else:
         # For other providers (Factorial), process all weekdays
-        for day in range(1, num_days + 1):
-            if stop_event is not None and stop_event.is_set():
-                logger("Process stopped by user.\n")
+        date_obj = first_day
+        while date_obj <= last_day:
+            if _stop_requested(stop_event, deadline, logger):
+                stopped = True
                 break
-            date_obj = datetime.date(year, month, day)
-            if date_obj.weekday() < 5:  # Only process Monday to Friday
+            if date_obj.isoformat() in completed_days:
+                logger.debug("Skipping %s - already processed", date_obj, key="already_processed")
+                _day_event(events, "skipped", date_obj.isoformat(), reason="already processed")
+            elif date_obj.weekday() < 5:  # Only process Monday to Friday
                 day_str = date_obj.isoformat()
-                logger(f"Processing {day_str} ({date_obj.strftime('%A')}):")
-                errors = provider.schedule_day_shifts(employee_id, day_str, auth_data, logger)
+                logger.info("Processing %s (%s):", day_str, calendar.day_name[date_obj.weekday()])
+                errors = _run_day(provider, employee_id, day_str, auth_data, logger, results, events)
+                processed += 1
                 if errors:
                     failed_days[day_str] = errors
+                if checkpoint is not None and not _interrupted(stop_event, deadline):
+                    checkpoint.record_day(day_str, errors)
             else:
-                logger(f"Skipping {date_obj.isoformat()} ({date_obj.strftime('%A')}) - Weekend")
-    
-    logger("Finished scheduling the month.\n")
+                logger.debug("Skipping %s (%s) - Weekend", date_obj, calendar.day_name[date_obj.weekday()], key="weekend")
+                _day_event(events, "skipped", date_obj.isoformat(), reason="weekend")
+            date_obj += datetime.timedelta(days=1)
+
+    # A stop or deadline during the last processed day ends the loop without a check between days
+    if not stopped and _stop_requested(stop_event, deadline, logger):
+        stopped = True
+    if checkpoint is not None and not stopped:
+        checkpoint.finish()
+    # The summary stays the last event, so the verification goes first
+    incomplete = None
+    if verify and not stopped:
+        incomplete = verify_range_shifts(provider, employee_id, first_day, last_day, auth_data, logger=logger,
+                                         stop_event=stop_event, deadline=deadline, events=events)
+        # Incomplete days are reported as failed, even when every shift was accepted
+        for day_str, (registered, planned) in (incomplete or {}).items():
+            failed_days[day_str] = {**(failed_days.get(day_str) or {}),
+                                    VERIFICATION_ERROR: f"{registered}/{planned} minutes registered"}
+    _summary_event(events, failed_days, processed, stopped, incomplete)
+    return failed_days
+
+def retry_failed_shifts(provider, employee_id, previous_results, auth_data, logger=print, stop_event=None, results=None, deadline=None, events=None):
+    """Re-submit only the retryable failed day/shift pairs from a previous run"""
+    log = as_run_logger(logger)
+    failed_days = {}
+    to_retry = retryable_failures(previous_results, provider=provider.name)
+    log.summary("Retrying %d failed shifts over %d days\n", sum(len(shifts) for shifts in to_retry.values()), len(to_retry))
+    processed = 0
+    stopped = False
+    with call_limits(stop_event, deadline):
+        for day_str, shifts in sorted(to_retry.items()):
+            if _stop_requested(stop_event, deadline, log):
+                stopped = True
+                break
+            errors = _run_day(provider, employee_id, day_str, auth_data, log, results, events, shifts=shifts)
+            processed += 1
+            if errors:
+                failed_days[day_str] = errors
+    log.summary("Finished retrying failed shifts: %d days with errors.\n", len(failed_days))
+    _summary_event(events, failed_days, processed, stopped)
     return failed_days
 
+def schedule_plan(provider, plan, auth_by_employee, logger=print, stop_event=None, results=None, deadline=None, events=None):
+    """Submit a SchedulePlan (see plan.py) one employee day at a time, reading its rows lazily.
+
+    auth_by_employee maps each planned employee to its credentials. Returns
+    {employee_id: {day: errors}} for the days with errors. With Endalia, only
+    the days check_missing_range reports for the employee are submitted.
+    """
+    log = as_run_logger(logger)
+    failed = {}
+    processed = 0
+    stopped = False
+    missing_days = None
+    checked_employee = None
+    log.summary("Submitting a plan of %d shifts\n", len(plan))
+    with call_limits(stop_event, deadline):
+        for employee_id, day_str, planned in plan.by_day():
+            if _stop_requested(stop_event, deadline, log):
+                stopped = True
+                break
+            if isinstance(provider, EndaliaProvider):
+                # Rows are ordered by employee, so each employee's range is checked once
+                if employee_id != checked_employee:
+                    log.info("Checking which days need to be scheduled for employee %s...", employee_id)
+                    missing_days = set(provider.check_missing_range(plan.first_day, plan.last_day,
+                                                                    auth_by_employee[employee_id], log))
+                    checked_employee = employee_id
+                if day_str not in missing_days:
+                    log.debug("Skipping employee %s, %s - not missing", employee_id, day_str, key="not_missing")
+                    _day_event(events, "skipped", day_str, employee_id=employee_id, reason="not missing")
+                    continue
+            log.info("Processing employee %s, %s:", employee_id, day_str, key="plan_day")
+            _day_event(events, "started", day_str, employee_id=employee_id)
+            errors = provider.schedule_planned_shifts(employee_id, day_str, planned, auth_by_employee[employee_id], log,
+                                                      results=results, events=events)
+            _day_event(events, "failed" if errors else "succeeded", day_str, employee_id=employee_id)
+            processed += 1
+            if errors:
+                failed.setdefault(employee_id, {})[day_str] = errors
+    log.summary("Finished the plan: %d days with errors.\n", sum(len(days) for days in failed.values()))
+    _summary_event(events, {f"{employee_id}:{day}": errors for employee_id, days in failed.items()
+                            for day, errors in days.items()}, processed, stopped)
+    return failed
+
+def schedule_employees_month(employees, year, month, transport=None, logger=print, stop_event=None, results=None, deadline=None, events=None):
+    """Schedule a month for several employee configs (see get_employee_configs) through one SchedulePlan per provider.
+
+    Returns {"provider:employee_id": {day: errors}} for the employees with errors.
+    """
+    log = as_run_logger(logger)
+    first_day = datetime.date(year, month, 1)
+    last_day = datetime.date(year, month, calendar.monthrange(year, month)[1])
+    by_provider = {}
+    for employee in employees:
+        provider_type = employee.get("provider", "factorial").lower()
+        provider, auth_data = get_provider(provider_type, employee, transport)
+        by_provider.setdefault(provider_type, (provider, {}))[1][employee["employee_id"]] = auth_data
+
+    failed = {}
+    for provider_type, (provider, auth_by_employee) in by_provider.items():
+        if _interrupted(stop_event, deadline):
+            break
+        log.summary("Planning %d-%02d for %d %s employee(s)\n", year, month, len(auth_by_employee), provider_type)
+        month_plan = build_plan(auth_by_employee, first_day, last_day, provider.shift_template)
+        failed_days = schedule_plan(provider, month_plan, auth_by_employee, logger=log, stop_event=stop_event,
+                                    results=results, deadline=deadline, events=events)
+        for employee_id, days in failed_days.items():
+            failed[f"{provider_type}:{employee_id}"] = days
+    return failed
+
 # Legacy functions for backward compatibility
 def schedule_day_shifts(employee_id, day, cookie, logger=print):
     """Legacy function - use FactorialProvider instead"""
@@ -469,16 +892,44 @@ def create_attendance_shift(employee_id, date, clock_in, clock_out, cookie):
     provider = FactorialProvider()
     return provider._create_attendance_shift(employee_id, date, clock_in, clock_out, cookie)
 
-def get_month_year_from_args():
-    """Get month and year from command line arguments or user input"""
-    import argparse
-    
+def _percentile(value):
+    percentile = float(value)
+    if not 0 < percentile <= 100:
+        raise argparse.ArgumentTypeError(f"must be greater than 0 and at most 100, got {value}")
+    return percentile
+
+def build_arg_parser():
+    """Command line options for the CLI"""
     parser = argparse.ArgumentParser(description="Schedule time tracking shifts")
     parser.add_argument("-m", "--month", type=int, help="Month (1-12)")
     parser.add_argument("-y", "--year", type=int, help="Year (e.g., 2025)")
     parser.add_argument("--interactive", action="store_true", help="Use interactive mode to input month/year")
-    
-    args = parser.parse_args()
+    parser.add_argument("--resume", metavar="JOB_ID", help="Resume an interrupted job from its first unfinished day")
+    parser.add_argument("--list-jobs", action="store_true", help="List jobs that have not finished yet")
+    parser.add_argument("--all-employees", action="store_true", help="Schedule the month for every entry of the config's employees list, through one plan per provider")
+    parser.add_argument("--verify", action="store_true", help="Read the month back after the run and report days still incomplete")
+    parser.add_argument("--results-out", metavar="PATH", help="Write per-shift results as JSON to this file")
+    parser.add_argument("--retry-failed", metavar="PATH", help="Re-submit only the retryable failed shifts from a previous results file")
+    parser.add_argument("--connect-timeout", type=float, default=DEFAULT_TIMEOUT[0], metavar="SECONDS", help="Connect timeout per request")
+    parser.add_argument("--read-timeout", type=float, default=DEFAULT_TIMEOUT[1], metavar="SECONDS", help="Read timeout per request")
+    parser.add_argument("--deadline", type=float, metavar="SECONDS", help="Stop the run (including in-flight requests) after this long")
+    parser.add_argument("--log-mode", choices=sorted(MODES), default="verbose", help="How much to log (default: verbose)")
+    parser.add_argument("--log-sample", type=int, default=1, metavar="N", help="Log only every Nth repetitive line (per shift, weekend, ...)")
+    parser.add_argument("--events", action="store_true", help="Write one JSON event per day and shift to stdout (NDJSON); logs go to stderr")
+    parser.add_argument("--record", metavar="PATH", help="Record every HTTP exchange to this JSONL file")
+    parser.add_argument("--replay", metavar="PATH", help="Replay a recorded JSONL file instead of calling the providers")
+    parser.add_argument("--replay-latency", type=int, default=0, metavar="MS", help="Replay mode: synthetic latency per request")
+    parser.add_argument("--hedge-delay", type=int, metavar="MS", help="Send a second copy of a read-only status query still unanswered after MS")
+    parser.add_argument("--hedge-percentile", type=_percentile, metavar="P", help="Hedge reads slower than this percentile of recent reads (falls back to --hedge-delay)")
+    parser.add_argument("--daemon", action="store_true", help="Keep running and fill only the days since the last confirmed one")
+    parser.add_argument("--interval", type=int, metavar="MINUTES", help="Daemon mode: minutes between runs (default: daily)")
+    parser.add_argument("--at", metavar="HH:MM", help="Daemon mode: run every day at this time")
+    return parser
+
+def get_month_year_from_args(args=None):
+    """Get month and year from command line arguments or user input"""
+    if args is None:
+        args = build_arg_parser().parse_args()
     
     # If interactive mode is requested or no arguments provided
     if args.interactive or (args.month is None and args.year is None):
@@ -536,30 +987,111 @@ def get_month_year_from_args():
 
 if __name__ == "__main__":
     config = load_config()
-    employee_id = config["employee_id"]
+    employee_id = config.get("employee_id")  # Daemon mode may use an "employees" list instead
     
     # Determine provider type based on config
     provider_type = config.get("provider", "factorial")  # Default to factorial for backward compatibility
     
+    args = build_arg_parser().parse_args()
+    job_store = JobStore(config.get("jobs_db", DEFAULT_DB_PATH))
+    hedge = None
+    if args.hedge_delay is not None or args.hedge_percentile is not None:
+        hedge = HedgePolicy(delay=(args.hedge_delay if args.hedge_delay is not None else 500) / 1000.0,
+                            percentile=args.hedge_percentile)
+    transport = get_transport(record=args.record, replay=args.replay, latency_ms=args.replay_latency,
+                              timeout=(args.connect_timeout, args.read_timeout), hedge=hedge)
+    log = RunLogger(print, mode=args.log_mode, sample_every=args.log_sample)
+
+    events = None
+    if args.events:
+        # Human-readable output moves to stderr so stdout carries only NDJSON events
+        event_stream = sys.stdout
+        sys.stdout = sys.stderr
+        def events(event):
+            event_stream.write(json.dumps(event) + "\n")
+            event_stream.flush()
+
     try:
-        provider, auth_data = get_provider(provider_type, config)
-        year, month = get_month_year_from_args()
-        
-        print(f"Scheduling shifts for {calendar.month_name[month]} {year}")
-        print(f"Using provider: {provider_type}")
-        print()
+        if args.list_jobs:
+            for job in job_store.list_unfinished_jobs():
+                print(f"{job['job_id']}  {job['provider']}  employee {job['employee_id']}  "
+                      f"{job['year']}-{job['month']:02d}  last update {job['updated_at']}")
+            sys.exit(0)
+
+        if args.daemon:
+            from daemon import run_daemon
+            run_daemon(config, job_store, interval_minutes=args.interval, at=args.at, logger=log, transport=transport)
+            sys.exit(0)
+
+        if employee_id is None and not args.resume and not args.all_employees:
+            raise ValueError("employee_id is missing from config.json")
+
+        results = []
+
+        if args.all_employees:
+            if args.resume or args.retry_failed or args.verify:
+                raise ValueError("--all-employees cannot be combined with --resume, --retry-failed or --verify")
+            year, month = get_month_year_from_args(args)
+            employees = get_employee_configs(config)
+
+            print(f"Scheduling shifts for {calendar.month_name[month]} {year}")
+            print(f"Employees: {len(employees)}")
+            print()
+
+            month_schedule = schedule_employees_month(employees, year, month, transport, logger=log, results=results,
+                                                      deadline=deadline_after(args.deadline), events=events)
+        elif args.retry_failed:
+            provider, auth_data = get_provider(provider_type, config, transport)
+
+            print(f"Retrying failed shifts from {args.retry_failed}")
+            print(f"Using provider: {provider_type}")
+            print()
+
+            month_schedule = retry_failed_shifts(provider, employee_id, load_results(args.retry_failed), auth_data,
+                                                 logger=log, results=results, deadline=deadline_after(args.deadline),
+                                                 events=events)
+        else:
+            if args.resume:
+                job = job_store.get_job(args.resume)
+                if job is None:
+                    raise ValueError(f"Unknown job id: {args.resume}")
+                provider_type = job["provider"]
+                employee_id = job["employee_id"]
+                year, month = job["year"], job["month"]
+                job_id = job["job_id"]
+            else:
+                year, month = get_month_year_from_args(args)
+                job_id = job_store.create_job(provider_type, employee_id, year, month)
+
+            provider, auth_data = get_provider(provider_type, config, transport)
+            
+            print(f"Scheduling shifts for {calendar.month_name[month]} {year}")
+            print(f"Using provider: {provider_type}")
+            print(f"Job ID: {job_id} (resume with --resume {job_id})")
+            print()
+
+            month_schedule = schedule_month_shifts(provider, employee_id, year, month, auth_data, logger=log,
+                                                   checkpoint=job_store.checkpoint(job_id), results=results,
+                                                   deadline=deadline_after(args.deadline), events=events,
+                                                   verify=args.verify)
 
-        month_schedule = schedule_month_shifts(provider, employee_id, year, month, auth_data)
+        if args.results_out:
+            save_results(args.results_out, results)
+            print(f"\nResults written to {args.results_out}")
         
         if month_schedule:
             print("\nErrors encountered:")
             print(json.dumps(month_schedule, indent=2))
         else:
             print("\nAll shifts scheduled successfully!")
+        incomplete_days = sorted(day for day, errors in month_schedule.items() if VERIFICATION_ERROR in errors)
+        if incomplete_days:
+            print(f"\nVerification: {len(incomplete_days)} days still incomplete: {', '.join(incomplete_days)}")
+            sys.exit(1)
             
     except ValueError as e:
         print(f"Configuration error: {e}")
         sys.exit(1)
     except KeyboardInterrupt:
         print("\nOperation cancelled by user")
-        sys.exit(0)
\ No newline at end of file
+        sys.exit(0)
@@ -0,0 +1,132 @@
+import datetime
+from array import array
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the array-based columns produce the same rows
+    np = None
+
+PlanRow = namedtuple("PlanRow", ["employee_id", "day", "shift", "clock_in", "clock_out"])
+
+WEEKDAYS = (0, 1, 2, 3, 4)
+_EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+
+def _minutes(hhmm):
+    hours, minutes = hhmm.split(":")
+    return int(hours) * 60 + int(minutes)
+
+class SchedulePlan:
+    """Columnar (employee, day, shift, clock_in, clock_out) rows of a bulk run.
+
+    Columns hold one entry per row, ordered by employee, day, then shift:
+    days count from 1970-01-01 and clock times are minutes since then
+    (datetime64[D] and datetime64[m] arrays when built with NumPy); shifts
+    index into shift_template. Timestamps are only formatted as rows are read,
+    once per distinct day.
+    first_day and last_day are the planned range, before masking.
+    """
+
+    def __init__(self, shift_template, employee_ids, days, shifts, clock_in, clock_out, first_day=None, last_day=None):
+        self.shift_template = tuple(shift_template)
+        self.first_day = first_day
+        self.last_day = last_day
+        self.employee_ids = employee_ids
+        self.days = days
+        self.shifts = shifts
+        self.clock_in = clock_in
+        self.clock_out = clock_out
+
+    def __len__(self):
+        return len(self.shifts)
+
+    def rows(self):
+        """Yield PlanRow tuples with ISO dates and "...T09:00:00.000Z" timestamps"""
+        for employee_id, day, planned in self.by_day():
+            for shift_name, clock_in, clock_out in planned:
+                yield PlanRow(employee_id, day, shift_name, clock_in, clock_out)
+
+    def by_day(self):
+        """Yield (employee_id, day, [(shift, clock_in, clock_out), ...]) for each planned employee day.
+
+        Employees planned on the same day share its shifts, so each day is
+        formatted once and the same list is yielded to all of them; callers
+        must not modify it.
+        """
+        names = [shift_name for shift_name, _, _ in self.shift_template]
+        times = [(f"T{start}:00.000Z", f"T{end}:00.000Z") for _, start, end in self.shift_template]
+        employee_ids, days, shifts = self._columns()
+        formatted = {}
+        count = len(shifts)
+        start = 0
+        while start < count:
+            employee_id, day = employee_ids[start], days[start]
+            stop = start + 1
+            while stop < count and days[stop] == day and employee_ids[stop] == employee_id:
+                stop += 1
+            key = (day, tuple(shifts[start:stop]))
+            planned_day = formatted.get(key)
+            if planned_day is None:
+                iso_day = datetime.date.fromordinal(day + _EPOCH_ORDINAL).isoformat()
+                planned_day = formatted[key] = (iso_day, [(names[shift], iso_day + times[shift][0], iso_day + times[shift][1])
+                                                          for shift in key[1]])
+            yield employee_id, planned_day[0], planned_day[1]
+            start = stop
+
+    def _columns(self):
+        # Plain ints index much faster than NumPy scalars; days count from 1970-01-01 either way
+        if np is not None and isinstance(self.days, np.ndarray):
+            return self.employee_ids.tolist(), self.days.astype(np.int64).tolist(), self.shifts.tolist()
+        return self.employee_ids, self.days, self.shifts
+
+def build_plan(employee_ids, first_day, last_day, shift_template, holidays=(), weekdays=WEEKDAYS, use_numpy=None):
+    """Plan every shift of the template for each employee on the working days between first_day and last_day.
+
+    Days that are not in weekdays (Monday=0) or are listed in holidays are
+    masked out. NumPy is used when installed unless use_numpy is False.
+    """
+    if use_numpy is None:
+        use_numpy = np is not None
+    if use_numpy and np is None:
+        raise RuntimeError("NumPy is not installed")
+    build = _build_numpy if use_numpy else _build_arrays
+    return build(list(employee_ids), first_day, last_day, tuple(shift_template), holidays, weekdays)
+
+def _build_numpy(employee_ids, first_day, last_day, shift_template, holidays, weekdays):
+    days = np.arange(np.datetime64(first_day, "D"), np.datetime64(last_day + datetime.timedelta(days=1), "D"))
+    # 1970-01-01 was a Thursday
+    mask = np.isin((days.astype(np.int64) + 3) % 7, list(weekdays))
+    if holidays:
+        mask &= ~np.isin(days, np.array([np.datetime64(day, "D") for day in holidays]))
+    days = days[mask]
+
+    shift_count = len(shift_template)
+    starts = np.array([_minutes(start) for _, start, _ in shift_template], dtype="timedelta64[m]")
+    ends = np.array([_minutes(end) for _, _, end in shift_template], dtype="timedelta64[m]")
+    employee_col = np.repeat(np.array(employee_ids, dtype=np.int64), len(days) * shift_count)
+    day_col = np.tile(np.repeat(days, shift_count), len(employee_ids))
+    shift_col = np.tile(np.arange(shift_count, dtype=np.int8), len(employee_ids) * len(days))
+    day_minutes = day_col.astype("datetime64[m]")
+    return SchedulePlan(shift_template, employee_col, day_col, shift_col,
+                        day_minutes + starts[shift_col], day_minutes + ends[shift_col], first_day, last_day)
+
+def _build_arrays(employee_ids, first_day, last_day, shift_template, holidays, weekdays):
+    weekdays = set(weekdays)
+    holidays = {day.toordinal() for day in holidays}
+    # date.toordinal() is 1 for Monday 0001-01-01
+    days = [ordinal - _EPOCH_ORDINAL for ordinal in range(first_day.toordinal(), last_day.toordinal() + 1)
+            if (ordinal - 1) % 7 in weekdays and ordinal not in holidays]
+
+    shift_count = len(shift_template)
+    starts = [_minutes(start) for _, start, _ in shift_template]
+    ends = [_minutes(end) for _, _, end in shift_template]
+    # One employee's columns, repeated for the others
+    day_col = array("q", [day for day in days for _ in range(shift_count)])
+    clock_in = array("q", [day * 1440 + start for day in days for start in starts])
+    clock_out = array("q", [day * 1440 + end for day in days for end in ends])
+    employee_col = array("q")
+    for employee_id in employee_ids:
+        employee_col.extend(array("q", [employee_id]) * len(day_col))
+    count = len(employee_ids)
+    return SchedulePlan(shift_template, employee_col, day_col * count, array("b", range(shift_count)) * (len(days) * count),
+                        clock_in * count, clock_out * count, first_day, last_day)
@@ -0,0 +1,51 @@
+import json
+from collections import namedtuple
+
+# One record per submitted shift. status_code is None when no HTTP response
+# was received; error_class is None on success.
+ShiftResult = namedtuple("ShiftResult", ["day", "shift", "provider", "status_code", "error_class", "retryable", "message"])
+
+RETRYABLE_STATUS_CODES = {408, 425, 429}
+RETRYABLE_ERROR_CLASSES = {"ConnectionError", "Timeout", "ConnectTimeout", "ReadTimeout", "ChunkedEncodingError",
+                           "DeadlineExceeded", "RequestCancelled"}
+
+def is_retryable(status_code, error_class):
+    """Transport failures, throttling and server errors are worth retrying; rejected shifts are not"""
+    if error_class is None:
+        return False
+    if status_code is not None:
+        return status_code in RETRYABLE_STATUS_CODES or status_code >= 500
+    return error_class in RETRYABLE_ERROR_CLASSES
+
+def success_result(day, shift, provider, status_code):
+    return ShiftResult(day, shift, provider, status_code, None, False, None)
+
+def failure_result(day, shift, provider, status_code, error_class, message):
+    return ShiftResult(day, shift, provider, status_code, error_class, is_retryable(status_code, error_class), message)
+
+def shift_event(result):
+    """Event-stream form of a ShiftResult"""
+    return {"type": "shift", "status": "failed" if result.error_class else "succeeded", **result._asdict()}
+
+def retryable_failures(results, provider=None):
+    """Map each day to the shift names that failed with a retryable error"""
+    failures = {}
+    for result in results:
+        if result.retryable and (provider is None or result.provider == provider):
+            failures.setdefault(result.day, []).append(result.shift)
+    return failures
+
+def results_to_json(results):
+    # One compact record per line keeps large exports readable and diffable
+    return "[\n" + ",\n".join(json.dumps(result._asdict()) for result in results) + "\n]"
+
+def results_from_json(text):
+    return [ShiftResult(**record) for record in json.loads(text)]
+
+def save_results(path, results):
+    with open(path, "w") as f:
+        f.write(results_to_json(results))
+
+def load_results(path):
+    with open(path, "r") as f:
+        return results_from_json(f.read())
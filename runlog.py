@@ -0,0 +1,68 @@
+DEBUG = 10
+INFO = 20
+SUMMARY = 25
+WARNING = 30
+ERROR = 40
+
+# Lowest level shown in each mode. "verbose" shows every line, like the plain logger=print did.
+MODES = {
+    "verbose": DEBUG,
+    "normal": INFO,
+    "summary": SUMMARY,
+    "quiet": WARNING,
+}
+
+class RunLogger:
+    """Leveled logger for the scheduling hot path.
+
+    Messages use %-style arguments that are only formatted when the line is
+    actually emitted. Lines logged with a key are sampled: with
+    sample_every=N only every Nth line per key is emitted. An instance is
+    still callable as logger(msg), so it can be passed wherever a plain
+    logger=print is expected.
+    """
+
+    def __init__(self, sink=print, mode="verbose", sample_every=1):
+        if mode not in MODES:
+            raise ValueError(f"Unknown log mode: {mode}")
+        self.sink = sink
+        self.level = MODES[mode]
+        self.sample_every = max(1, sample_every)
+        self._seen = {}
+
+    def __call__(self, msg):
+        self.log(INFO, msg)
+
+    def enabled(self, level):
+        return level >= self.level
+
+    def log(self, level, msg, *args, key=None):
+        if level < self.level:
+            return
+        if key is not None and self.sample_every > 1:
+            seen = self._seen.get(key, 0)
+            self._seen[key] = seen + 1
+            if seen % self.sample_every:
+                return
+        self.sink(msg % args if args else msg)
+
+    def debug(self, msg, *args, key=None):
+        self.log(DEBUG, msg, *args, key=key)
+
+    def info(self, msg, *args, key=None):
+        self.log(INFO, msg, *args, key=key)
+
+    def summary(self, msg, *args):
+        self.log(SUMMARY, msg, *args)
+
+    def warning(self, msg, *args, key=None):
+        self.log(WARNING, msg, *args, key=key)
+
+    def error(self, msg, *args):
+        self.log(ERROR, msg, *args)
+
+def as_run_logger(logger):
+    """Wrap a plain callable such as print; RunLogger instances are returned unchanged"""
+    if isinstance(logger, RunLogger):
+        return logger
+    return RunLogger(sink=logger)
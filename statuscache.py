@@ -0,0 +1,48 @@
+import threading
+import time
+from collections import OrderedDict
+
+class MonthStatusCache:
+    """In-process TTL + LRU cache of provider day statuses.
+
+    Keys are (provider, identity, first_day, last_day), identity being a
+    hash of the credentials. Writes to a day drop every cached range for
+    that identity containing it.
+    """
+
+    def __init__(self, ttl=300, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            stored_at, value = entry
+            if time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic(), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_day(self, provider, identity, day):
+        """Forget every cached range of this provider/identity that includes day"""
+        with self._lock:
+            stale = [key for key in self._entries
+                     if key[0] == provider and key[1] == identity and key[2] <= day <= key[3]]
+            for key in stale:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
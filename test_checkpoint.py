@@ -0,0 +1,72 @@
+import datetime
+import threading
+
+from checkpoint import JobStore
+from daemon import fill_since_watermark
+from main import TimeProvider, schedule_range_shifts
+
+class StubProvider(TimeProvider):
+    """Records the days it is asked to schedule and answers with errors[day].
+
+    stop_on sets stop_event while that day is being submitted.
+    """
+    name = "factorial"
+
+    def __init__(self, errors=None, stop_on=None, stop_event=None):
+        super().__init__(transport=object())
+        self.days = []
+        self.errors = errors or {}
+        self.stop_on = stop_on
+        self.stop_event = stop_event
+
+    def schedule_day_shifts(self, employee_id, day, auth_data, logger=print, results=None, shifts=None, events=None):
+        self.days.append(day)
+        if day == self.stop_on:
+            self.stop_event.set()
+        return self.errors.get(day)
+
+def quiet(*args, **kwargs):
+    pass
+
+def test_stop_during_the_last_day_leaves_the_job_unfinished(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.create_job("factorial", 1, 2025, 1)
+    stop_event = threading.Event()
+    provider = StubProvider(stop_on="2025-01-03", stop_event=stop_event)
+    events = []
+
+    schedule_range_shifts(provider, 1, datetime.date(2025, 1, 1), datetime.date(2025, 1, 3), "cookie", logger=quiet,
+                          stop_event=stop_event, checkpoint=store.checkpoint(job_id), events=events.append)
+
+    assert provider.days == ["2025-01-01", "2025-01-02", "2025-01-03"]
+    assert store.get_job(job_id)["status"] == "running"
+    assert [job["job_id"] for job in store.list_unfinished_jobs()] == [job_id]
+    assert sorted(store.checkpoint(job_id).completed_days()) == ["2025-01-01", "2025-01-02"]
+    assert events[-1]["type"] == "summary" and events[-1]["stopped"]
+
+def test_watermark_catches_up_once_the_failed_day_goes_through(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.set_watermark("factorial", 1, datetime.date(2025, 1, 5))
+    today = datetime.date(2025, 1, 10)
+
+    provider = StubProvider(errors={"2025-01-07": {"morning": "09:00 - 13:00: Server error"}})
+    failed = fill_since_watermark(provider, "factorial", 1, "cookie", store, logger=quiet, today=today)
+    assert list(failed) == ["2025-01-07"]
+    assert store.get_watermark("factorial", 1) == datetime.date(2025, 1, 6)
+    assert store.confirmed_days("factorial", 1) == {datetime.date(2025, 1, day) for day in (8, 9, 10)}
+
+    # Only the failed day is posted again; the confirmed days after it are skipped
+    provider = StubProvider()
+    assert fill_since_watermark(provider, "factorial", 1, "cookie", store, logger=quiet, today=today) == {}
+    assert provider.days == ["2025-01-07"]
+    assert store.get_watermark("factorial", 1) == today
+    assert store.confirmed_days("factorial", 1) == set()
+
+def test_already_registered_rejections_do_not_hold_the_watermark_back(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    store.set_watermark("factorial", 1, datetime.date(2025, 1, 5))
+    today = datetime.date(2025, 1, 8)
+
+    provider = StubProvider(errors={"2025-01-07": {"morning": "09:00 - 13:00: Shift overlaps with another shift"}})
+    assert fill_since_watermark(provider, "factorial", 1, "cookie", store, logger=quiet, today=today) == {}
+    assert store.get_watermark("factorial", 1) == today
@@ -0,0 +1,192 @@
+import threading
+import time
+
+import pytest
+
+import workqueue
+from jobscheduler import JobScheduler, INTERACTIVE, BULK
+from main import TimeProvider
+from workqueue import WorkQueue, run_worker
+
+def make_queue(tmp_path, **kwargs):
+    return WorkQueue(str(tmp_path / "queue.db"), **kwargs)
+
+def expire_leases(work_queue):
+    work_queue._update("UPDATE tasks SET lease_expires = ? WHERE state = 'leased'", (time.time() - 1,))
+
+def test_claim_leases_tasks_in_order_once(tmp_path):
+    work_queue = make_queue(tmp_path)
+    batch_id = work_queue.enqueue_bulk([("factorial", 1), ("endalia", 2)], 2025, 1)
+
+    first = work_queue.claim("w1")
+    second = work_queue.claim("w2")
+    assert (first["employee_id"], first["attempts"]) == (1, 1)
+    assert (second["employee_id"], second["provider"]) == (2, "endalia")
+    assert work_queue.claim("w3") is None
+    assert work_queue.report(batch_id)["states"] == {"leased": 2}
+
+def test_by_day_splits_into_one_task_per_day(tmp_path):
+    work_queue = make_queue(tmp_path)
+    batch_id = work_queue.enqueue_bulk([("factorial", 1)], 2025, 2, by_day=True)
+    assert work_queue.report(batch_id)["tasks"] == 28
+
+def test_expired_lease_is_reclaimed_and_old_owner_is_locked_out(tmp_path):
+    work_queue = make_queue(tmp_path)
+    batch_id = work_queue.enqueue_bulk([("factorial", 1)], 2025, 1)
+    task = work_queue.claim("w1")
+    assert work_queue.claim("w2") is None
+
+    expire_leases(work_queue)
+    reclaimed = work_queue.claim("w2")
+    assert reclaimed["task_id"] == task["task_id"]
+    assert reclaimed["attempts"] == 2
+    assert not work_queue.renew(task["task_id"], "w1")
+    assert not work_queue.complete(task["task_id"], "w1", {})
+    assert work_queue.complete(task["task_id"], "w2", {"2025-01-02": {"morning": "error"}})
+
+    report = work_queue.report(batch_id)
+    assert report["finished"]
+    assert report["errors"] == {"factorial:1": {"2025-01-02": {"morning": "error"}}}
+
+def test_fail_retries_until_attempts_are_used_up(tmp_path):
+    work_queue = make_queue(tmp_path, max_attempts=2)
+    batch_id = work_queue.enqueue_bulk([("factorial", 1)], 2025, 1)
+
+    task = work_queue.claim("w1")
+    assert work_queue.fail(task["task_id"], "w1", "boom", task["attempts"])
+    assert work_queue.report(batch_id)["states"] == {"pending": 1}
+
+    task = work_queue.claim("w1")
+    assert task["attempts"] == 2
+    work_queue.fail(task["task_id"], "w1", "boom again", task["attempts"])
+    report = work_queue.report(batch_id)
+    assert report["states"] == {"failed": 1}
+    assert report["errors"] == {"factorial:1": {"2025-01-01..2025-01-31": "boom again"}}
+    assert work_queue.claim("w1") is None
+
+def test_lease_expiring_on_last_attempt_fails_the_task(tmp_path):
+    work_queue = make_queue(tmp_path, max_attempts=1)
+    batch_id = work_queue.enqueue_bulk([("factorial", 1)], 2025, 1)
+    work_queue.claim("w1")
+
+    expire_leases(work_queue)
+    assert work_queue.claim("w2") is None
+    assert work_queue.report(batch_id)["states"] == {"failed": 1}
+
+def test_release_gives_the_attempt_back(tmp_path):
+    work_queue = make_queue(tmp_path, max_attempts=1)
+    work_queue.enqueue_bulk([("factorial", 1)], 2025, 1)
+    task = work_queue.claim("w1")
+
+    assert not work_queue.release(task["task_id"], "w2")
+    assert work_queue.release(task["task_id"], "w1")
+    assert work_queue.claim("w2")["attempts"] == 1
+
+class RecordingProvider(TimeProvider):
+    name = "factorial"
+
+    def __init__(self):
+        super().__init__(transport=object())
+        self.days = []
+
+    def schedule_day_shifts(self, employee_id, day, auth_data, logger=print, results=None, shifts=None, events=None):
+        self.days.append(day)
+        return None
+
+def test_retried_task_skips_the_days_already_processed(tmp_path, monkeypatch):
+    work_queue = make_queue(tmp_path)
+    batch_id = work_queue.enqueue_bulk([("factorial", 1)], 2025, 1)
+    # The first worker got through 2025-01-01 and 2025-01-02, then died
+    task = work_queue.claim("w1")
+    for day in ("2025-01-01", "2025-01-02"):
+        work_queue.checkpoint(task["task_id"]).record_day(day, None)
+    expire_leases(work_queue)
+
+    provider = RecordingProvider()
+    monkeypatch.setattr(workqueue, "get_provider", lambda provider_type, config, transport: (provider, "cookie"))
+    run_worker(work_queue, {"employee_id": 1}, worker_id="w2", logger=lambda *args, **kwargs: None,
+               exit_when_idle=True)
+
+    assert provider.days[0] == "2025-01-03"
+    assert len(provider.days) == 21
+    report = work_queue.report(batch_id)
+    assert report["states"] == {"done": 1}
+    assert report["errors"] == {}
+
+class Jobs:
+    """Stub runs that record their start and block until released"""
+
+    def __init__(self):
+        self.started = []
+        self._cond = threading.Condition()
+        self._release = {}
+
+    def run(self, name):
+        self._release[name] = threading.Event()
+        def run():
+            with self._cond:
+                self.started.append(name)
+                self._cond.notify_all()
+            self._release[name].wait(5)
+        return run
+
+    def release(self, name):
+        self._release[name].set()
+
+    def wait_started(self, count):
+        with self._cond:
+            assert self._cond.wait_for(lambda: len(self.started) >= count, timeout=5)
+        return list(self.started)
+
+def test_interactive_jobs_go_before_queued_bulk_jobs():
+    scheduler = JobScheduler(max_workers=1, reserved_interactive=0)
+    jobs = Jobs()
+    scheduler.submit(jobs.run("running"), user="a", priority=BULK)
+    jobs.wait_started(1)
+    scheduler.submit(jobs.run("bulk"), user="b", priority=BULK)
+    scheduler.submit(jobs.run("interactive"), user="c", priority=INTERACTIVE)
+
+    jobs.release("running")
+    assert jobs.wait_started(2) == ["running", "interactive"]
+    jobs.release("interactive")
+    assert jobs.wait_started(3)[2] == "bulk"
+    jobs.release("bulk")
+
+def test_bulk_jobs_leave_the_reserved_slots_to_interactive_ones():
+    scheduler = JobScheduler(max_workers=2, reserved_interactive=1)
+    jobs = Jobs()
+    scheduler.submit(jobs.run("bulk1"), user="a", priority=BULK)
+    scheduler.submit(jobs.run("bulk2"), user="b", priority=BULK)
+    assert jobs.wait_started(1) == ["bulk1"]
+    assert scheduler.snapshot()["queued"] == {INTERACTIVE: 0, BULK: 1}
+
+    scheduler.submit(jobs.run("interactive"), user="c", priority=INTERACTIVE)
+    assert jobs.wait_started(2) == ["bulk1", "interactive"]
+    for name in ("bulk1", "interactive"):
+        jobs.release(name)
+    assert jobs.wait_started(3)[2] == "bulk2"
+    jobs.release("bulk2")
+
+def test_users_take_turns_and_queue_positions_are_reported():
+    scheduler = JobScheduler(max_workers=1, reserved_interactive=0)
+    jobs = Jobs()
+    positions = {}
+    def on_queue(name):
+        return lambda position: positions.setdefault(name, []).append(position)
+
+    scheduler.submit(jobs.run("a1"), user="a", priority=BULK)
+    jobs.wait_started(1)
+    for name, user in (("a2", "a"), ("a3", "a"), ("b1", "b")):
+        scheduler.submit(jobs.run(name), user=user, priority=BULK, on_queue=on_queue(name))
+    # b has nothing running, so its first job goes ahead of a's queued ones
+    assert positions == {"a2": [1, 2], "a3": [2, 3], "b1": [1]}
+
+    for count, name in enumerate(("a1", "b1", "a2"), 2):
+        jobs.release(name)
+        jobs.wait_started(count)
+    assert jobs.started == ["a1", "b1", "a2", "a3"]
+    jobs.release("a3")
+
+def test_unknown_priority_is_rejected():
+    with pytest.raises(ValueError):
+        JobScheduler().submit(lambda: None, user="a", priority="urgent")
@@ -0,0 +1,364 @@
+import json
+import math
+import random
+import re
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from contextlib import contextmanager
+from queue import Empty, Queue
+
+import requests
+
+# request() takes a json argument like requests does, which shadows the module
+_json = json
+
+# (connect, read) seconds for a single HTTP request
+DEFAULT_TIMEOUT = (5, 30)
+
+class RequestCancelled(requests.exceptions.RequestException):
+    """The job was stopped while the request was in flight"""
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """The job deadline passed before the request completed"""
+
+_limits = threading.local()
+
+@contextmanager
+def call_limits(stop_event=None, deadline=None):
+    """Apply a stop event and a deadline (time.monotonic() value) to every request made by this thread"""
+    previous = getattr(_limits, "value", (None, None))
+    _limits.value = (stop_event, deadline)
+    try:
+        yield
+    finally:
+        _limits.value = previous
+
+def current_limits():
+    return getattr(_limits, "value", (None, None))
+
+def deadline_after(seconds):
+    """Deadline for call_limits, seconds from now (None means no deadline)"""
+    return time.monotonic() + seconds if seconds else None
+
+def check_limits():
+    """Raise if the current job was stopped or ran out of time"""
+    stop_event, deadline = current_limits()
+    if stop_event is not None and stop_event.is_set():
+        raise RequestCancelled("Request cancelled: process stopped by user")
+    if deadline is not None and time.monotonic() >= deadline:
+        raise DeadlineExceeded("Job deadline exceeded")
+
+class Transport(ABC):
+    """How providers talk HTTP. Responses behave like requests.Response.
+
+    idempotent=True marks a read-only query that is safe to send twice;
+    only those are ever hedged.
+    """
+
+    @abstractmethod
+    def request(self, method, url, headers=None, json=None, idempotent=False):
+        pass
+
+    def get(self, url, headers=None, idempotent=False):
+        return self.request("GET", url, headers=headers, idempotent=idempotent)
+
+    def post(self, url, json=None, headers=None, idempotent=False):
+        return self.request("POST", url, headers=headers, json=json, idempotent=idempotent)
+
+class HttpTransport(Transport):
+    """Real HTTP through a shared requests.Session (connections stay warm between calls).
+
+    Every request gets (connect, read) timeouts, capped by the job deadline.
+    When the job has a stop event or a deadline, the request runs on a helper
+    thread so either one aborts the wait right away; the abandoned call ends
+    on its own within the read timeout.
+    """
+
+    def __init__(self, session=None, timeout=DEFAULT_TIMEOUT):
+        self.session = session if session is not None else requests.Session()
+        self.timeout = timeout
+
+    def request(self, method, url, headers=None, json=None, idempotent=False):
+        check_limits()
+        stop_event, deadline = current_limits()
+        connect_timeout, read_timeout = self.timeout
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            connect_timeout, read_timeout = min(connect_timeout, remaining), min(read_timeout, remaining)
+        send = lambda: self.session.request(method, url, headers=headers, json=json,
+                                            timeout=(connect_timeout, read_timeout))
+        # requests' read timeout is per socket read, so only the helper thread bounds the total time
+        if stop_event is None and deadline is None:
+            return send()
+
+        outcome = {}
+        done = threading.Event()
+
+        def run():
+            try:
+                outcome["response"] = send()
+            except Exception as e:
+                outcome["error"] = e
+            finally:
+                done.set()
+
+        threading.Thread(target=run, daemon=True).start()
+        while not done.wait(0.05):
+            check_limits()
+        if "error" in outcome:
+            raise outcome["error"]
+        return outcome["response"]
+
+class RecordingTransport(Transport):
+    """Forwards to another transport and appends every exchange to a JSONL file.
+
+    Request headers are not recorded, so cookies and tokens never reach the file.
+    """
+
+    def __init__(self, inner, path):
+        self.inner = inner
+        self.path = path
+        self._lock = threading.Lock()
+
+    def request(self, method, url, headers=None, json=None, idempotent=False):
+        record = {"method": method, "url": url, "body": json}
+        started = time.monotonic()
+        try:
+            response = self.inner.request(method, url, headers=headers, json=json, idempotent=idempotent)
+        except requests.exceptions.RequestException as e:
+            record.update(error_class=type(e).__name__, error=str(e), elapsed=time.monotonic() - started)
+            self._write(record)
+            raise
+        record.update(status_code=response.status_code, text=response.text, elapsed=time.monotonic() - started)
+        self._write(record)
+        return response
+
+    def _write(self, record):
+        line = _json.dumps(record)
+        with self._lock:
+            with open(self.path, "a") as f:
+                f.write(line + "\n")
+
+class ReplayTransport(Transport):
+    """Serves responses captured by RecordingTransport, without touching the network.
+
+    Requests are matched on method, URL and body first, then on method and URL
+    with dates stripped, so a recording of one month can drive any other month.
+    Matching recordings are served in turn. latency and jitter (seconds) add a
+    synthetic delay per call; seed makes the jitter deterministic.
+    """
+
+    def __init__(self, path, latency=0.0, jitter=0.0, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._exact = {}
+        self._by_endpoint = {}
+        self._served = {}
+        with open(path, "r") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = _json.loads(line)
+                self._exact.setdefault(_exact_key(record["method"], record["url"], record.get("body")), []).append(record)
+                self._by_endpoint.setdefault(_endpoint_key(record["method"], record["url"]), []).append(record)
+
+    def request(self, method, url, headers=None, json=None, idempotent=False):
+        check_limits()
+        with self._lock:
+            key = _exact_key(method, url, json)
+            candidates = self._exact.get(key)
+            if not candidates:
+                key = _endpoint_key(method, url)
+                candidates = self._by_endpoint.get(key)
+            if not candidates:
+                raise requests.exceptions.ConnectionError(f"No recorded response for {method} {url}")
+            record = candidates[self._served.get(key, 0) % len(candidates)]
+            self._served[key] = self._served.get(key, 0) + 1
+            delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0.0)
+
+        if delay > 0:
+            _sleep(delay)
+        if record.get("error_class"):
+            error_type = getattr(requests.exceptions, record["error_class"], requests.exceptions.RequestException)
+            raise error_type(record["error"])
+
+        response = requests.Response()
+        response.status_code = record["status_code"]
+        response._content = record["text"].encode("utf-8")
+        response.encoding = "utf-8"
+        response.url = url
+        return response
+
+class HedgePolicy:
+    """When to send the second copy of a hedged read.
+
+    With a percentile, the hedge fires once the first request has been
+    outstanding longer than that percentile of the last `window` read
+    latencies; until min_samples latencies are known, and without a
+    percentile, it fires after `delay` seconds.
+    """
+
+    def __init__(self, delay=0.5, percentile=None, window=200, min_samples=20):
+        if percentile is not None and not 0 < percentile <= 100:
+            raise ValueError(f"Hedge percentile must be in (0, 100], got {percentile}")
+        self.delay = delay
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self._lock:
+            self._latencies.append(seconds)
+
+    def hedge_delay(self):
+        if self.percentile is None:
+            return self.delay
+        with self._lock:
+            if len(self._latencies) < self.min_samples:
+                return self.delay
+            latencies = sorted(self._latencies)
+        return latencies[min(len(latencies) - 1, math.ceil(len(latencies) * self.percentile / 100.0) - 1)]
+
+class HedgeMetrics:
+    """Counters of hedged reads, for a process (shared by HedgedTransports) or a single run (counting_hedges)"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {"reads": 0, "hedges_fired": 0, "hedge_wins": 0}
+
+    def count(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._counts)
+
+_run_hedges = threading.local()
+
+@contextmanager
+def counting_hedges():
+    """Also count the hedged reads made by this thread into a fresh HedgeMetrics, for one run"""
+    previous = getattr(_run_hedges, "value", None)
+    metrics = HedgeMetrics()
+    _run_hedges.value = metrics
+    try:
+        yield metrics
+    finally:
+        _run_hedges.value = previous
+
+class HedgedTransport(Transport):
+    """Sends a second copy of slow idempotent reads and returns whichever answers first.
+
+    Writes, and any request not flagged idempotent, go straight through.
+    The copies run on helper threads; call_limits is thread-local, so the
+    caller's stop event and deadline are handed to them explicitly. The
+    losing copy is abandoned and ends on its own within its timeout.
+    """
+
+    def __init__(self, inner, policy=None, metrics=None):
+        self.inner = inner
+        self.policy = policy or HedgePolicy()
+        self.metrics = metrics or HedgeMetrics()
+
+    def request(self, method, url, headers=None, json=None, idempotent=False):
+        if not idempotent:
+            return self.inner.request(method, url, headers=headers, json=json)
+        check_limits()
+        # Every count happens on the calling thread, so the run counting there sees only its own reads
+        counters = [self.metrics]
+        if getattr(_run_hedges, "value", None) is not None:
+            counters.append(_run_hedges.value)
+        def count(name):
+            for metrics in counters:
+                metrics.count(name)
+        count("reads")
+        limits = current_limits()
+        outcomes = Queue()
+
+        def send(copy):
+            started = time.monotonic()
+            try:
+                with call_limits(*limits):
+                    response = self.inner.request(method, url, headers=headers, json=json, idempotent=True)
+                self.policy.observe(time.monotonic() - started)
+                outcomes.put((copy, response, None))
+            except Exception as e:
+                outcomes.put((copy, None, e))
+
+        threading.Thread(target=send, args=("first",), daemon=True).start()
+        pending = 1
+        hedged = False
+        error = None
+        wait = self.policy.hedge_delay()
+        while pending:
+            outcome = _next_outcome(outcomes, wait)
+            if outcome is None:
+                # The first copy is slow: fire the hedge and wait for whichever comes back
+                threading.Thread(target=send, args=("hedge",), daemon=True).start()
+                count("hedges_fired")
+                pending += 1
+                hedged = True
+                wait = None
+                continue
+            pending -= 1
+            copy, response, e = outcome
+            if e is None:
+                if copy == "hedge":
+                    count("hedge_wins")
+                return response
+            if not hedged or isinstance(e, (RequestCancelled, DeadlineExceeded)):
+                raise e
+            # One copy failed; the other may still answer
+            error = error or e
+        raise error
+
+def _next_outcome(outcomes, wait):
+    """Next finished copy, or None once wait seconds pass; the job limits are checked meanwhile"""
+    until = time.monotonic() + wait if wait is not None else None
+    while True:
+        check_limits()
+        timeout = 0.05 if until is None else min(0.05, until - time.monotonic())
+        if timeout <= 0:
+            return None
+        try:
+            return outcomes.get(timeout=timeout)
+        except Empty:
+            pass
+
+def get_transport(record=None, replay=None, latency_ms=0, jitter_ms=0, timeout=DEFAULT_TIMEOUT, hedge=None,
+                  hedge_metrics=None):
+    """Build the transport selected by the --record/--replay/--hedge-* options"""
+    if replay:
+        transport = ReplayTransport(replay, latency=latency_ms / 1000.0, jitter=jitter_ms / 1000.0)
+    else:
+        transport = HttpTransport(timeout=timeout)
+        if record:
+            transport = RecordingTransport(transport, record)
+    if hedge is not None:
+        transport = HedgedTransport(transport, hedge, hedge_metrics)
+    return transport
+
+_DATE_PATTERN = re.compile(r"\d{4}-\d{2}-\d{2}")
+
+def _exact_key(method, url, body):
+    return (method, url, _json.dumps(body, sort_keys=True))
+
+def _endpoint_key(method, url):
+    return (method, _DATE_PATTERN.sub("{date}", url))
+
+def _sleep(seconds):
+    """Sleep like a slow request would: cut short by a stop or the job deadline"""
+    stop_event, deadline = current_limits()
+    if deadline is not None:
+        seconds = min(seconds, max(deadline - time.monotonic(), 0))
+    if stop_event is not None:
+        stop_event.wait(seconds)
+    else:
+        time.sleep(seconds)
+    check_limits()
@@ -1,15 +1,48 @@
 from flask import Flask, request, Response, render_template_string
 import threading
-import queue
 import json
+import calendar
+import os
+import time
+import uuid
+import hashlib
+import hmac
 import datetime  # import datetime for timestamps
+from collections import OrderedDict
 
-from main import schedule_month_shifts, get_provider
+import requests
 
-app = Flask(__name__)
-# Global variable to manage cancellation
-scheduler_stop_event = None
+from main import schedule_month_shifts, schedule_range_shifts, retry_failed_shifts, get_provider, month_status_cache
+from results import results_to_json, results_from_json
+from transport import HedgePolicy, HedgeMetrics, get_transport, call_limits, deadline_after, DEFAULT_TIMEOUT
+from runlog import RunLogger, MODES as LOG_MODES
+from checkpoint import JobStore, DEFAULT_DB_PATH
+from jobscheduler import JobScheduler, INTERACTIVE, BULK, PRIORITIES
 
+app = Flask(__name__)
+job_store = JobStore(os.environ.get("JOBS_DB", DEFAULT_DB_PATH))
+# Per-request (connect, read) timeouts and an overall deadline per job, in seconds
+REQUEST_TIMEOUT = (float(os.environ.get("SHIFTS_CONNECT_TIMEOUT", DEFAULT_TIMEOUT[0])),
+                   float(os.environ.get("SHIFTS_READ_TIMEOUT", DEFAULT_TIMEOUT[1])))
+JOB_DEADLINE = float(os.environ.get("SHIFTS_JOB_DEADLINE", 15 * 60))
+# Seconds a provider month status stays cached, shared by /status and scheduling runs
+STATUS_CACHE_TTL = float(os.environ.get("SHIFTS_STATUS_CACHE_TTL", month_status_cache.ttl))
+month_status_cache.ttl = STATUS_CACHE_TTL
+# Hedge slow read-only status queries (off unless a delay or percentile is set); counters are served by /metrics
+hedge_policy = None
+if os.environ.get("SHIFTS_HEDGE_DELAY_MS") or os.environ.get("SHIFTS_HEDGE_PERCENTILE"):
+    hedge_policy = HedgePolicy(delay=float(os.environ.get("SHIFTS_HEDGE_DELAY_MS", "500")) / 1000.0,
+                               percentile=float(os.environ["SHIFTS_HEDGE_PERCENTILE"]) if os.environ.get("SHIFTS_HEDGE_PERCENTILE") else None)
+hedge_metrics = HedgeMetrics()
+# Record/replay HTTP traffic for offline profiling; by default each job gets its own HTTP session
+shared_transport = None
+if os.environ.get("SHIFTS_RECORD") or os.environ.get("SHIFTS_REPLAY"):
+    shared_transport = get_transport(record=os.environ.get("SHIFTS_RECORD"), replay=os.environ.get("SHIFTS_REPLAY"),
+                                     latency_ms=int(os.environ.get("SHIFTS_REPLAY_LATENCY_MS", "0")),
+                                     timeout=REQUEST_TIMEOUT, hedge=hedge_policy, hedge_metrics=hedge_metrics)
+# Jobs run on a bounded number of threads; interactive requests keep SHIFTS_INTERACTIVE_SLOTS of them to themselves
+job_scheduler = JobScheduler(max_workers=int(os.environ.get("SHIFTS_MAX_JOBS", "4")),
+                             reserved_interactive=int(os.environ.get("SHIFTS_INTERACTIVE_SLOTS", "1")))
 FORM_HTML = """
 <!doctype html>
 <html>
@@ -176,6 +209,21 @@ FORM_HTML = """
               </select>
             </div>
           </div>
+          Retry failed shifts from a previous results file (optional):
+          <input type="file" name="results_file" id="results_file" accept=".json,application/json"><br><br>
+          Log detail:
+          <select name="log_mode" id="log_mode">
+            <option value="verbose" selected>Verbose</option>
+            <option value="normal">Normal</option>
+            <option value="summary">Summary only</option>
+            <option value="quiet">Errors only</option>
+          </select><br>
+          Priority:
+          <select name="priority" id="priority">
+            <option value="interactive" selected>Interactive</option>
+            <option value="bulk">Bulk (backfills)</option>
+          </select><br>
+          <label><input type="checkbox" name="verify" value="1"> Verify the month after scheduling</label><br>
           <input type="submit" value="Schedule Shifts">
         </form>
         <!-- Stop form hidden by default and separated by margin -->
@@ -204,6 +252,8 @@ FORM_HTML = """
       const safariDateFallback = document.getElementById("safariDateFallback");
       const safariMonth = document.getElementById("safariMonth");
       const safariYear = document.getElementById("safariYear");
+      // Id of the job started by the last submission, for the stop button
+      let currentJobId = null;
 
       // Detect Safari and show fallback if needed
       const isSafari = /^((?!chrome|android).)*safari/i.test(navigator.userAgent);
@@ -325,8 +375,13 @@ FORM_HTML = """
         formData.append("year", year);
         formData.append("month", month);
         
-        fetch("/schedule", { method: "POST", body: formData })
+        // With a previous results file, only its retryable failed shifts are re-submitted
+        const resultsFile = document.getElementById("results_file").files[0];
+        const endpoint = resultsFile ? "/retry" : "/schedule";
+        
+        fetch(endpoint, { method: "POST", body: formData })
           .then(response => {
+            currentJobId = response.headers.get("X-Job-Id");
             const reader = response.body.getReader();
             const decoder = new TextDecoder();
             function read() {
@@ -343,7 +398,13 @@ FORM_HTML = """
 
       stopForm.addEventListener("submit", function(e) {
         e.preventDefault();
-        fetch("/stop", { method: "POST" })
+        // The job's credentials are sent along: only their holder may stop it
+        const stopData = new FormData();
+        stopData.append("job_id", currentJobId || "");
+        stopData.append("provider", providerSelect.value);
+        stopData.append("cookie", document.getElementById("cookie").value.trim());
+        stopData.append("auth_token", document.getElementById("auth_token").value.trim());
+        fetch("/stop", { method: "POST", body: stopData })
           .then(response => response.text())
           .then(text => {
             logsDiv.innerText += "\\n" + text;
@@ -355,31 +416,200 @@ FORM_HTML = """
 </html>
 """
 
+def _job_transport():
+    return shared_transport or get_transport(timeout=REQUEST_TIMEOUT, hedge=hedge_policy, hedge_metrics=hedge_metrics)
+
 @app.route("/")
 def index():
     return render_template_string(FORM_HTML)
 
-@app.route("/schedule", methods=["POST"])
-def schedule():
-    global scheduler_stop_event
-    
-    # Get form data
-    employee_id = int(request.form["employee_id"])
-    provider_type = request.form["provider"]
-    year = int(request.form["year"])
-    month = int(request.form["month"])
-    
-    # Get authentication data based on provider type
+def _auth_from_form(provider_type):
+    """Return (auth_data, error_response) for the submitted provider credentials"""
     if provider_type == "factorial":
         auth_data = request.form.get("cookie", "")
     elif provider_type == "endalia":
         auth_data = request.form.get("auth_token", "")
     else:
-        return Response("Invalid provider type", status=400)
+        return None, Response("Invalid provider type", status=400)
     
     if not auth_data:
-        return Response("Authentication data is required", status=400)
-    
+        return None, Response("Authentication data is required", status=400)
+    return auth_data, None
+
+class Job:
+    """Output of one background run, which any number of requests can follow.
+
+    Items are (kind, payload) pairs: "log" lines, "event" dicts, and the
+    "final" result and shift "results" at the end. Each follower renders
+    them in its own format, so nothing is serialized that nobody reads.
+    Events also update a compact progress summary; version counts its changes.
+    """
+
+    def __init__(self, key=None, details=None, credentials_hash=None):
+        self.id = uuid.uuid4().hex[:16]
+        self.key = key
+        # Only a caller holding the same credentials may stop the job
+        self.credentials_hash = credentials_hash
+        self.lines = []
+        self.done = False
+        self.stop_event = threading.Event()
+        self.version = 0
+        self.progress = {"id": self.id, **(details or {}), "state": "queued", "position": None,
+                         "days_processed": 0, "days_failed": 0, "failed_days": [],
+                         "shifts_succeeded": 0, "shifts_failed": 0, "current_day": None}
+        self._cond = threading.Condition()
+
+    def put(self, kind, payload):
+        with self._cond:
+            self.lines.append((kind, payload))
+            if kind == "event":
+                self._track(payload)
+            self._cond.notify_all()
+
+    def _track(self, event):
+        progress = self.progress
+        if event["type"] == "queued":
+            progress["position"] = event["position"]
+        elif event["type"] == "job":
+            progress["checkpoint_job_id"] = event["job_id"]
+        elif event["type"] == "day":
+            progress["state"] = "running"
+            progress["position"] = None
+            if event["status"] == "started":
+                progress["current_day"] = event["day"]
+            elif event["status"] in ("succeeded", "failed"):
+                progress["days_processed"] += 1
+                if event["status"] == "failed":
+                    progress["days_failed"] += 1
+                    progress["failed_days"].append(event["day"])
+        elif event["type"] == "shift" and event["status"] != "started":
+            progress["shifts_succeeded" if event["status"] == "succeeded" else "shifts_failed"] += 1
+        elif event["type"] == "summary":
+            progress["stopped"] = event.get("stopped", False)
+            if event.get("error"):
+                progress["error"] = event["error"]
+        elif event["type"] == "verification":
+            progress["incomplete_days"] = sorted(event["incomplete"])
+        else:
+            return
+        self.version += 1
+
+    def start(self):
+        with self._cond:
+            self.progress["state"] = "running"
+            self.progress["position"] = None
+            self.version += 1
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self.done = True
+            progress = self.progress
+            progress["current_day"] = None
+            progress["position"] = None
+            if progress.get("error"):
+                progress["state"] = "failed"
+            elif progress.get("stopped"):
+                progress["state"] = "stopped"
+            else:
+                progress["state"] = "finished"
+            self.version += 1
+            self._cond.notify_all()
+
+    def snapshot(self, seen_version=None, timeout=0):
+        """(version, progress copy); with seen_version, first wait up to timeout seconds for a newer version"""
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            while seen_version == self.version and not self.done:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            return self.version, {**self.progress, "failed_days": list(self.progress["failed_days"])}
+
+    def follow(self):
+        """Yield every item from the start of the job, then new ones as they arrive"""
+        position = 0
+        while True:
+            with self._cond:
+                while position >= len(self.lines) and not self.done:
+                    self._cond.wait()
+                batch = self.lines[position:]
+                position = len(self.lines)
+                done = self.done
+            yield from batch
+            if done and not batch:
+                return
+
+# Jobs still running, by (provider, employee_id, year, month, credentials hash), so duplicate submissions can attach to them
+inflight_jobs = {}
+inflight_lock = threading.Lock()
+# Every job by id for GET /api/jobs/<id>, oldest first
+jobs_by_id = OrderedDict()
+API_JOBS_KEEP = int(os.environ.get("SHIFTS_API_JOBS_KEEP", "1000"))
+# Longest long-poll of GET /api/jobs/<id>, in seconds. A held request occupies a server thread, and jobs
+# live in this process, so the Procfile runs a single gthread worker rather than the default sync one
+API_MAX_WAIT = 60
+
+def _stream_job(job, attached=False, ndjson=False):
+    def stream():
+        if attached:
+            yield "An identical job is already running; following its progress instead of starting another.\n"
+        for kind, payload in job.follow():
+            if kind == "log":
+                yield payload
+            elif kind == "final":
+                # Add a separator around the final JSON result
+                yield "\n" + "="*50 + "\nFinal Result:\n" + json.dumps(payload, indent=2) + "\n" + "="*50 + "\n"
+            elif kind == "results":
+                yield ("\nShift Results (save as a .json file to retry failed shifts):\n"
+                       + results_to_json(payload) + "\n")
+
+    def stream_ndjson():
+        if attached:
+            yield json.dumps({"type": "attached"}) + "\n"
+        for kind, payload in job.follow():
+            if kind == "event":
+                yield json.dumps(payload) + "\n"
+            elif kind == "log":
+                yield json.dumps({"type": "log", "message": payload.rstrip("\n")}) + "\n"
+
+    response = Response(stream_ndjson(), mimetype="application/x-ndjson") if ndjson else Response(stream(), mimetype="text/plain")
+    # Needed (with the credentials) to stop the job through /stop
+    response.headers["X-Job-Id"] = job.id
+    return response
+
+def _wants_ndjson():
+    """NDJSON events instead of plain-text logs, via ?format=ndjson, a format field or the Accept header"""
+    if request.values.get("format") == "ndjson":
+        return True
+    return request.accept_mimetypes.best == "application/x-ndjson"
+
+def _start_job(provider_type, employee_id, auth_data, work, key=None, details=None):
+    """Run work(provider, auth_data, logger, stop_event, results, events) through the job scheduler and stream its output.
+
+    If a job with the same key is still running, its log stream is followed instead.
+    Bulk jobs wait behind interactive ones; the queue position is reported while waiting.
+    """
+    # Lines below the chosen mode are dropped before any formatting happens;
+    # event streams only carry warnings and errors as log events by default
+    ndjson = _wants_ndjson()
+    log_mode = request.form.get("log_mode", "quiet" if ndjson else "verbose")
+    if log_mode not in LOG_MODES:
+        return Response("Invalid log mode", status=400)
+    priority = request.form.get("priority", INTERACTIVE)
+    if priority not in PRIORITIES:
+        return Response("Invalid priority", status=400)
+
+    job, attached = _submit_job(provider_type, employee_id, auth_data, work, key=key, priority=priority,
+                                log_mode=log_mode, details=details)
+    return _stream_job(job, attached=attached, ndjson=ndjson)
+
+def _submit_job(provider_type, employee_id, auth_data, work, key=None, priority=INTERACTIVE, log_mode="verbose", details=None):
+    """Queue work on the job scheduler; returns (job, attached).
+
+    attached is True when an identical job (same key) was still running and is returned instead.
+    """
     # Create configuration for the provider
     config = {
         "employee_id": employee_id,
@@ -390,51 +620,339 @@ def schedule():
         config["cookie"] = auth_data
     elif provider_type == "endalia":
         config["auth_token"] = auth_data
-    
-    q = queue.Queue()
-    scheduler_stop_event = threading.Event()
 
-    # Updated logger now adds a timestamp to every log line
-    def logger(msg):
-        timestamp = datetime.datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-        q.put(f"{timestamp} {msg}\n")
+    credentials_hash = _credentials_hash(auth_data)
+    if key is not None:
+        # Only a caller holding the same credentials may attach to a running job
+        key = (*key, credentials_hash)
+    with inflight_lock:
+        existing = inflight_jobs.get(key) if key is not None else None
+        if existing is not None:
+            return existing, True
+        job = Job(key, {"provider": provider_type, "employee_id": employee_id, "priority": priority, **(details or {})},
+                  credentials_hash)
+        if key is not None:
+            inflight_jobs[key] = job
+        _register_job(job)
+
+    # Updated logger now adds a timestamp to every log line; the timestamp
+    # string is only rebuilt when the second changes
+    last_stamp = [None, ""]
+    def emit(msg):
+        now = int(time.time())
+        if now != last_stamp[0]:
+            last_stamp[0] = now
+            last_stamp[1] = datetime.datetime.fromtimestamp(now).strftime("[%Y-%m-%d %H:%M:%S]")
+        job.put("log", f"{last_stamp[1]} {msg}\n")
+
+    logger = RunLogger(emit, mode=log_mode)
+
+    queued_at = [None]
 
     def run_scheduler():
+        results = []
+        job.start()
+        if queued_at[0] is not None:
+            emit(f"Starting after {time.monotonic() - queued_at[0]:.1f}s in the queue")
         try:
             # Get the appropriate provider
-            provider, auth_data_processed = get_provider(provider_type, config)
+            provider, auth_data_processed = get_provider(provider_type, config, _job_transport())
             
             # Run the scheduler
-            result = schedule_month_shifts(provider, employee_id, year, month, auth_data_processed, logger=logger, stop_event=scheduler_stop_event)
-            q.put("FINAL_RESULT:" + json.dumps(result, indent=2))
+            result = work(provider, auth_data_processed, logger, job.stop_event, results,
+                          lambda event: job.put("event", event))
+            job.put("final", result)
         except Exception as e:
-            logger(f"Error: {str(e)}")
-            q.put("FINAL_RESULT:" + json.dumps({"error": str(e)}, indent=2))
+            logger.error("Error: %s", e)
+            job.put("event", {"type": "summary", "error": str(e)})
+            job.put("final", {"error": str(e)})
         finally:
-            q.put(None)  # use sentinel to signal end
+            job.put("results", results)
+            with inflight_lock:
+                if inflight_jobs.get(key) is job:
+                    del inflight_jobs[key]
+            job.close()  # signal end to every follower
 
-    threading.Thread(target=run_scheduler).start()
+    def on_queue(position):
+        # Shown whatever the log mode: a waiting job would otherwise look stuck
+        if queued_at[0] is None:
+            queued_at[0] = time.monotonic()
+        emit(f"Queued ({priority}): position {position}")
+        job.put("event", {"type": "queued", "priority": priority, "position": position})
 
-    def stream():
-        while True:
-            line = q.get()
-            if line is None:
-                break
-            # Check for the final JSON result marker and add a separator if needed.
-            if line.startswith("FINAL_RESULT:"):
-                yield "\n" + "="*50 + "\nFinal Result:\n" + line.replace("FINAL_RESULT:", "") + "\n" + "="*50 + "\n"
-            else:
-                yield line
+    job_scheduler.submit(run_scheduler, user=(provider_type, employee_id), priority=priority, on_queue=on_queue)
+    return job, False
+
+def _credentials_hash(auth_data):
+    return hashlib.sha256(str(auth_data).encode("utf-8")).hexdigest()
 
-    return Response(stream(), mimetype="text/plain")
+def _register_job(job):
+    """Make a job pollable by id; the oldest finished jobs are forgotten beyond API_JOBS_KEEP (call with inflight_lock held)"""
+    jobs_by_id[job.id] = job
+    if len(jobs_by_id) > API_JOBS_KEEP:
+        for job_id in [job_id for job_id, known in jobs_by_id.items() if known.done][:len(jobs_by_id) - API_JOBS_KEEP]:
+            del jobs_by_id[job_id]
+
+def _start_month_job(provider_type, employee_id, year, month, auth_data, job_id=None, verify=False):
+    """Run a checkpointed month scheduling job (a new one unless job_id is given)"""
+    return _start_job(provider_type, employee_id, auth_data, _month_work(provider_type, employee_id, year, month, job_id, verify),
+                      key=(provider_type, employee_id, year, month), details=_range_details(*_month_range(year, month)))
+
+def _month_range(year, month):
+    return datetime.date(year, month, 1), datetime.date(year, month, calendar.monthrange(year, month)[1])
+
+def _range_details(first_day, last_day):
+    return {"first_day": first_day.isoformat(), "last_day": last_day.isoformat()}
+
+def _month_work(provider_type, employee_id, year, month, job_id=None, verify=False):
+    def work(provider, auth_data_processed, logger, stop_event, results, events):
+        checkpoint_id = job_id or job_store.create_job(provider_type, employee_id, year, month)
+        logger.summary("Job ID: %s", checkpoint_id)
+        events({"type": "job", "job_id": checkpoint_id, "provider": provider_type, "employee_id": employee_id,
+                "year": year, "month": month})
+        return schedule_month_shifts(provider, employee_id, year, month, auth_data_processed, logger=logger,
+                                     stop_event=stop_event, checkpoint=job_store.checkpoint(checkpoint_id),
+                                     results=results, deadline=deadline_after(JOB_DEADLINE), events=events,
+                                     verify=verify)
+    return work
+
+def _range_work(employee_id, first_day, last_day, verify=False):
+    def work(provider, auth_data_processed, logger, stop_event, results, events):
+        return schedule_range_shifts(provider, employee_id, first_day, last_day, auth_data_processed, logger=logger,
+                                     stop_event=stop_event, results=results, deadline=deadline_after(JOB_DEADLINE),
+                                     events=events, verify=verify)
+    return work
+
+@app.route("/schedule", methods=["POST"])
+def schedule():
+    # Get form data
+    employee_id = int(request.form["employee_id"])
+    provider_type = request.form["provider"]
+    year = int(request.form["year"])
+    month = int(request.form["month"])
+    
+    # Get authentication data based on provider type
+    auth_data, error = _auth_from_form(provider_type)
+    if error:
+        return error
+    
+    return _start_month_job(provider_type, employee_id, year, month, auth_data, verify=bool(request.form.get("verify")))
+
+@app.route("/resume", methods=["POST"])
+def resume():
+    """Continue an interrupted job from its first unfinished day"""
+    job = job_store.get_job(request.form.get("job_id", ""))
+    if job is None:
+        return Response("Unknown job id", status=404)
+    if job["status"] == "finished":
+        return Response("Job already finished", status=409)
+    
+    # Credentials are not stored with the job, so they must be sent again
+    auth_data, error = _auth_from_form(job["provider"])
+    if error:
+        return error
+    
+    return _start_month_job(job["provider"], job["employee_id"], job["year"], job["month"], auth_data,
+                            job_id=job["job_id"], verify=bool(request.form.get("verify")))
+
+@app.route("/retry", methods=["POST"])
+def retry():
+    """Re-submit only the retryable failed shifts from an uploaded results file"""
+    employee_id = int(request.form["employee_id"])
+    provider_type = request.form["provider"]
+    
+    results_file = request.files.get("results_file")
+    if results_file is None:
+        return Response("A results file is required", status=400)
+    try:
+        previous_results = results_from_json(results_file.read().decode("utf-8"))
+    except (ValueError, TypeError) as e:
+        return Response(f"Invalid results file: {e}", status=400)
+    
+    auth_data, error = _auth_from_form(provider_type)
+    if error:
+        return error
+    
+    def work(provider, auth_data_processed, logger, stop_event, results, events):
+        return retry_failed_shifts(provider, employee_id, previous_results, auth_data_processed, logger=logger,
+                                   stop_event=stop_event, results=results, deadline=deadline_after(JOB_DEADLINE),
+                                   events=events)
+
+    return _start_job(provider_type, employee_id, auth_data, work)
+
+@app.route("/status", methods=["GET"])
+def status():
+    """Read-only view of which days of a month are missing, served from the shared status cache"""
+    provider_type = request.args.get("provider", "endalia")
+    if provider_type != "endalia":
+        return Response("Status is only available for Endalia", status=400)
+    # The endpoint answers for the token's owner, so an employee_id argument is not needed
+    try:
+        year = int(request.args["year"])
+        month = int(request.args["month"])
+        first_day = datetime.date(year, month, 1)
+    except (KeyError, ValueError):
+        return Response("year and month are required", status=400)
+    
+    # The token comes in a header so it does not end up in access logs
+    authorization = request.headers.get("Authorization", "")
+    if not authorization.startswith("Bearer "):
+        return Response("Authorization: Bearer <token> header is required", status=401)
+    auth_token = authorization[len("Bearer "):]
+    
+    last_day = min(datetime.date(year, month, calendar.monthrange(year, month)[1]), datetime.date.today())
+    if first_day > last_day:
+        return app.response_class(json.dumps({"days": [], "missing": []}), mimetype="application/json")
+    
+    provider, _ = get_provider(provider_type, {}, _job_transport())
+    try:
+        with call_limits(deadline=deadline_after(REQUEST_TIMEOUT[0] + REQUEST_TIMEOUT[1])):
+            days = provider.fetch_day_status(first_day, last_day, auth_token)
+    except requests.exceptions.RequestException as e:
+        return Response(f"Could not read status: {e}", status=502)
+    
+    summary = []
+    for day_info in days:
+        registered = day_info.get("RegisterMinutes", 0)
+        planned = day_info.get("PlannedMinutes", 0)
+        summary.append({"day": day_info.get("Day", ""), "registered": registered, "planned": planned,
+                        "missing": planned > 0 and registered != planned})
+    body = {"days": summary, "missing": [day["day"] for day in summary if day["missing"]]}
+    return app.response_class(json.dumps(body), mimetype="application/json")
+
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """Process-wide counters of hedged status reads and scheduled jobs"""
+    return app.response_class(json.dumps({"hedging": hedge_policy is not None, **hedge_metrics.snapshot(),
+                                          "jobs": job_scheduler.snapshot()}),
+                              mimetype="application/json")
+
+def _json_response(body, status=200):
+    return app.response_class(json.dumps(body), status=status, mimetype="application/json")
+
+def _parse_api_entry(entry):
+    """(provider, employee_id, credentials, first_day, last_day, (year, month) or None, verify) of a POST /api/jobs entry"""
+    if not isinstance(entry, dict):
+        raise ValueError("each entry must be an object")
+    provider_type = str(entry.get("provider", "factorial")).lower()
+    if provider_type not in ("factorial", "endalia"):
+        raise ValueError(f"unknown provider: {provider_type}")
+    employee_id = int(entry["employee_id"])
+    credentials = entry.get("credentials") or entry.get("cookie" if provider_type == "factorial" else "auth_token")
+    if not credentials:
+        raise ValueError("credentials are required")
+    if "year" in entry or "month" in entry:
+        year, month = int(entry["year"]), int(entry["month"])
+        first_day, last_day = _month_range(year, month)
+        return provider_type, employee_id, credentials, first_day, last_day, (year, month), bool(entry.get("verify"))
+    first_day = datetime.date.fromisoformat(entry["first_day"])
+    last_day = datetime.date.fromisoformat(entry["last_day"])
+    if first_day > last_day:
+        raise ValueError("first_day is after last_day")
+    return provider_type, employee_id, credentials, first_day, last_day, None, bool(entry.get("verify"))
+
+@app.route("/api/jobs", methods=["POST"])
+def api_create_jobs():
+    """Queue one job per entry and return their ids right away.
+
+    The body is a list of entries, or {"jobs": [...], "priority": ...}. An
+    entry has provider, employee_id, credentials (cookie or token) and either
+    year and month (a checkpointed month job) or first_day and last_day, and
+    optionally verify. Jobs run with bulk priority by default.
+    """
+    body = request.get_json(silent=True)
+    entries = body.get("jobs") if isinstance(body, dict) else body
+    priority = body.get("priority", BULK) if isinstance(body, dict) else BULK
+    if not isinstance(entries, list) or not entries:
+        return _json_response({"error": "a non-empty list of jobs is required"}, 400)
+    if not isinstance(priority, str) or priority not in PRIORITIES:
+        return _json_response({"error": f"unknown priority: {priority}"}, 400)
+    
+    # Nothing is started unless every entry is valid
+    parsed = []
+    errors = []
+    for index, entry in enumerate(entries):
+        try:
+            parsed.append(_parse_api_entry(entry))
+        except KeyError as e:
+            errors.append({"index": index, "error": f"missing field {e}"})
+        except (TypeError, ValueError) as e:
+            errors.append({"index": index, "error": str(e)})
+    if errors:
+        return _json_response({"errors": errors}, 400)
+    
+    jobs = []
+    for provider_type, employee_id, credentials, first_day, last_day, year_month, verify in parsed:
+        if year_month is not None:
+            work = _month_work(provider_type, employee_id, *year_month, verify=verify)
+            key = (provider_type, employee_id, *year_month)
+        else:
+            work = _range_work(employee_id, first_day, last_day, verify)
+            key = (provider_type, employee_id, first_day.isoformat(), last_day.isoformat())
+        job, attached = _submit_job(provider_type, employee_id, credentials, work, key=key, priority=priority,
+                                    log_mode="quiet", details=_range_details(first_day, last_day))
+        jobs.append({"id": job.id, "url": f"/api/jobs/{job.id}", "attached": attached})
+    return _json_response({"jobs": jobs}, 202)
+
+@app.route("/api/jobs", methods=["GET"])
+def api_list_jobs():
+    """Progress of the jobs given by the comma-separated ?ids=.
+
+    Job ids are only handed to whoever started the job, so they act as the
+    access check; unknown ids are left out.
+    """
+    wanted = [job_id for job_id in request.args.get("ids", "").split(",") if job_id]
+    if not wanted:
+        return _json_response({"error": "ids is required"}, 400)
+    with inflight_lock:
+        jobs = [jobs_by_id[job_id] for job_id in dict.fromkeys(wanted) if job_id in jobs_by_id]
+    return _json_response({"jobs": [job.snapshot()[1] for job in jobs]})
+
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def api_job(job_id):
+    """Compact progress of one job.
+
+    The ETag changes with every progress update. With If-None-Match and
+    ?wait=SECONDS the request is held until the job progresses (or wait
+    runs out, answering 304), so clients can long-poll instead of streaming.
+    """
+    with inflight_lock:
+        job = jobs_by_id.get(job_id)
+    if job is None:
+        return _json_response({"error": "unknown job id"}, 404)
+    
+    seen_version = None
+    for etag in request.if_none_match.as_set():
+        prefix, _, version = etag.rpartition("-")
+        if prefix == job.id and version.isdigit():
+            seen_version = int(version)
+    try:
+        wait = min(max(float(request.args.get("wait", 0)), 0), API_MAX_WAIT)
+    except ValueError:
+        return _json_response({"error": "wait must be a number of seconds"}, 400)
+    
+    version, progress = job.snapshot(seen_version, wait if seen_version is not None else 0)
+    response = Response(status=304) if version == seen_version else _json_response(progress)
+    response.set_etag(f"{job.id}-{version}")
+    response.headers["Cache-Control"] = "no-cache"
+    return response
 
 @app.route("/stop", methods=["POST"])
 def stop():
-    global scheduler_stop_event
-    if scheduler_stop_event:
-        scheduler_stop_event.set()
-        return "Process cancellation requested."
-    return "No process running."
+    """Stop the job given by job_id (the X-Job-Id response header); the job's credentials are required"""
+    auth_data, error = _auth_from_form(request.form.get("provider", ""))
+    if error:
+        return error
+    with inflight_lock:
+        job = jobs_by_id.get(request.form.get("job_id", ""))
+    if job is None:
+        return Response("Unknown job id", status=404)
+    if not hmac.compare_digest(job.credentials_hash, _credentials_hash(auth_data)):
+        return Response("The credentials do not match this job", status=403)
+    if job.done:
+        return "No process running."
+    job.stop_event.set()
+    return "Process cancellation requested."
 
 if __name__ == "__main__":
     app.run(host="0.0.0.0", port=8080, debug=True, threaded=True)
@@ -0,0 +1,282 @@
+import argparse
+import calendar
+import datetime
+import json
+import os
+import socket
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+
+from main import load_config, get_provider, get_employee_configs, schedule_range_shifts
+from runlog import as_run_logger
+
+DEFAULT_QUEUE_PATH = "queue.db"
+# Seconds between the heartbeat's checks for a worker stop
+HEARTBEAT_POLL = 0.5
+
+class WorkQueue:
+    """Bulk scheduling tasks in an SQLite database shared by producers and workers.
+
+    Workers lease one task at a time. A lease that is not renewed (the worker
+    died) expires and the task is handed to another worker, up to
+    max_attempts times; the days a task already processed are kept, so a
+    retry picks up where the last attempt stopped. The database file must
+    be on a local disk: SQLite locking is unreliable on network filesystems,
+    so workers on other hosts could be handed the same lease.
+    """
+
+    def __init__(self, path=DEFAULT_QUEUE_PATH, lease_seconds=300, max_attempts=3):
+        self.path = path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        # Autocommit mode, so claims can take the write lock up front with BEGIN IMMEDIATE
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tasks ("
+            " task_id INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " batch_id TEXT NOT NULL,"
+            " provider TEXT NOT NULL,"
+            " employee_id INTEGER NOT NULL,"
+            " first_day TEXT NOT NULL,"
+            " last_day TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " lease_owner TEXT,"
+            " lease_expires REAL,"
+            " result TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS tasks_state ON tasks (state, task_id)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS task_days ("
+            " task_id INTEGER NOT NULL,"
+            " day TEXT NOT NULL,"
+            " errors TEXT,"
+            " PRIMARY KEY (task_id, day))"
+        )
+
+    def enqueue_bulk(self, employees, year, month, by_day=False, batch_id=None):
+        """Split a bulk run into one task per (employee, month) or per (employee, day); returns the batch id"""
+        batch_id = batch_id or uuid.uuid4().hex[:12]
+        num_days = calendar.monthrange(year, month)[1]
+        if by_day:
+            ranges = [(datetime.date(year, month, day),) * 2 for day in range(1, num_days + 1)]
+        else:
+            ranges = [(datetime.date(year, month, 1), datetime.date(year, month, num_days))]
+        rows = [(batch_id, provider_type.lower(), employee_id, first_day.isoformat(), last_day.isoformat())
+                for provider_type, employee_id in employees
+                for first_day, last_day in ranges]
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT INTO tasks (batch_id, provider, employee_id, first_day, last_day, state)"
+                " VALUES (?, ?, ?, ?, ?, 'pending')", rows
+            )
+            self._conn.execute("COMMIT")
+        return batch_id
+
+    def claim(self, worker_id):
+        """Lease the next runnable task to worker_id, or return None if there is none"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # Expired leases whose task has used up its attempts are given up on
+                self._conn.execute(
+                    "UPDATE tasks SET state = 'failed', lease_owner = NULL,"
+                    " result = '{\"error\": \"lease expired on last attempt\"}'"
+                    " WHERE state = 'leased' AND lease_expires < ? AND attempts >= ?",
+                    (now, self.max_attempts)
+                )
+                row = self._conn.execute(
+                    "SELECT * FROM tasks WHERE state = 'pending' OR (state = 'leased' AND lease_expires < ?)"
+                    " ORDER BY task_id LIMIT 1", (now,)
+                ).fetchone()
+                if row is not None:
+                    self._conn.execute(
+                        "UPDATE tasks SET state = 'leased', lease_owner = ?, lease_expires = ?, attempts = attempts + 1"
+                        " WHERE task_id = ?", (worker_id, now + self.lease_seconds, row["task_id"])
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return dict(row, attempts=row["attempts"] + 1) if row is not None else None
+
+    def renew(self, task_id, worker_id):
+        """Extend a lease; False means the lease was lost to another worker"""
+        return self._update("UPDATE tasks SET lease_expires = ? WHERE task_id = ? AND lease_owner = ? AND state = 'leased'",
+                            (time.time() + self.lease_seconds, task_id, worker_id))
+
+    def complete(self, task_id, worker_id, failed_days):
+        return self._update("UPDATE tasks SET state = 'done', lease_owner = NULL, result = ?"
+                            " WHERE task_id = ? AND lease_owner = ? AND state = 'leased'",
+                            (json.dumps({"failed_days": failed_days}), task_id, worker_id))
+
+    def fail(self, task_id, worker_id, error, attempts):
+        """Give a task back for another attempt, or mark it failed once attempts are used up"""
+        state = "failed" if attempts >= self.max_attempts else "pending"
+        return self._update("UPDATE tasks SET state = ?, lease_owner = NULL, result = ?"
+                            " WHERE task_id = ? AND lease_owner = ? AND state = 'leased'",
+                            (state, json.dumps({"error": error}), task_id, worker_id))
+
+    def release(self, task_id, worker_id):
+        """Hand a task back unfinished (the worker is stopping) without using up an attempt"""
+        return self._update("UPDATE tasks SET state = 'pending', lease_owner = NULL, attempts = attempts - 1"
+                            " WHERE task_id = ? AND lease_owner = ? AND state = 'leased'",
+                            (task_id, worker_id))
+
+    def checkpoint(self, task_id):
+        """Per-day progress of a task across its attempts, for schedule_range_shifts"""
+        return TaskCheckpoint(self, task_id)
+
+    def report(self, batch_id):
+        """Aggregated state of a batch: task counts per state and the errors per employee"""
+        with self._lock:
+            rows = self._conn.execute("SELECT * FROM tasks WHERE batch_id = ? ORDER BY task_id", (batch_id,)).fetchall()
+        counts = {}
+        errors = {}
+        for row in rows:
+            counts[row["state"]] = counts.get(row["state"], 0) + 1
+            result = json.loads(row["result"]) if row["result"] else {}
+            employee_errors = errors.setdefault(f"{row['provider']}:{row['employee_id']}", {})
+            if result.get("failed_days"):
+                employee_errors.update(result["failed_days"])
+            elif result.get("error") and row["state"] == "failed":
+                employee_errors[f"{row['first_day']}..{row['last_day']}"] = result["error"]
+        return {
+            "batch_id": batch_id,
+            "tasks": len(rows),
+            "states": counts,
+            "finished": bool(rows) and all(row["state"] in ("done", "failed") for row in rows),
+            "errors": {employee: days for employee, days in errors.items() if days},
+        }
+
+    def _update(self, sql, params):
+        with self._lock:
+            return self._conn.execute(sql, params).rowcount == 1
+
+class TaskCheckpoint:
+    """Days a task already processed, so a retried task does not post them again"""
+
+    def __init__(self, work_queue, task_id):
+        self.work_queue = work_queue
+        self.task_id = task_id
+        self.job_id = f"task:{task_id}"
+
+    def completed_days(self):
+        with self.work_queue._lock:
+            rows = self.work_queue._conn.execute("SELECT day, errors FROM task_days WHERE task_id = ?",
+                                                 (self.task_id,)).fetchall()
+        return {row["day"]: json.loads(row["errors"]) if row["errors"] else None for row in rows}
+
+    def record_day(self, day, errors):
+        self.work_queue._update("INSERT OR REPLACE INTO task_days VALUES (?, ?, ?)",
+                                (self.task_id, day, json.dumps(errors) if errors else None))
+
+    def finish(self):
+        # The task itself is closed by WorkQueue.complete()
+        pass
+
+def run_worker(work_queue, config, worker_id=None, transport=None, logger=print, stop_event=None,
+               poll_interval=5, exit_when_idle=False):
+    """Pull tasks and run them until stopped (or, with exit_when_idle, until the queue is empty)"""
+    log = as_run_logger(logger)
+    worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}"
+    stop_event = stop_event or threading.Event()
+    credentials = {(employee.get("provider", "factorial").lower(), employee["employee_id"]): employee
+                   for employee in get_employee_configs(config)}
+    providers = {}
+
+    log.summary("Worker %s started", worker_id)
+    while not stop_event.is_set():
+        task = work_queue.claim(worker_id)
+        if task is None:
+            if exit_when_idle:
+                break
+            stop_event.wait(poll_interval)
+            continue
+
+        key = (task["provider"], task["employee_id"])
+        log.info("Task %s: %s employee %s, %s - %s (attempt %d)", task["task_id"], key[0], key[1],
+                 task["first_day"], task["last_day"], task["attempts"])
+        if key not in credentials:
+            work_queue.fail(task["task_id"], worker_id, f"No credentials configured on worker {worker_id}", task["attempts"])
+            continue
+        # Providers (and their HTTP sessions) are kept per employee for the life of the worker
+        if key not in providers:
+            providers[key] = get_provider(key[0], credentials[key], transport)
+        provider, auth_data = providers[key]
+
+        # Keep the lease alive while the task runs; if the worker dies it lapses. A lost lease
+        # (another worker now owns the task) or a worker stop ends the task through task_stop.
+        done = threading.Event()
+        task_stop = threading.Event()
+        lease_lost = threading.Event()
+        def heartbeat(task_id=task["task_id"], done=done, task_stop=task_stop, lease_lost=lease_lost):
+            renew_at = time.monotonic() + work_queue.lease_seconds / 3
+            while not done.wait(HEARTBEAT_POLL):
+                if stop_event.is_set():
+                    task_stop.set()
+                if time.monotonic() >= renew_at:
+                    if not work_queue.renew(task_id, worker_id):
+                        log.warning("Task %s: lease lost, stopping it", task_id)
+                        lease_lost.set()
+                        task_stop.set()
+                        return
+                    renew_at = time.monotonic() + work_queue.lease_seconds / 3
+        threading.Thread(target=heartbeat, daemon=True).start()
+        try:
+            failed_days = schedule_range_shifts(provider, task["employee_id"],
+                                                datetime.date.fromisoformat(task["first_day"]),
+                                                datetime.date.fromisoformat(task["last_day"]),
+                                                auth_data, logger=log, stop_event=task_stop,
+                                                checkpoint=work_queue.checkpoint(task["task_id"]))
+            if lease_lost.is_set():
+                log.warning("Task %s: left to the worker that now holds its lease", task["task_id"])
+            elif task_stop.is_set():
+                work_queue.release(task["task_id"], worker_id)
+            else:
+                work_queue.complete(task["task_id"], worker_id, failed_days)
+        except Exception as e:
+            log.error("Task %s failed: %s", task["task_id"], e)
+            work_queue.fail(task["task_id"], worker_id, str(e), task["attempts"])
+        finally:
+            done.set()
+    log.summary("Worker %s stopped", worker_id)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk scheduling through a shared work queue")
+    parser.add_argument("--queue", help=f"Queue database path (default: config queue_db or {DEFAULT_QUEUE_PATH})")
+    commands = parser.add_subparsers(dest="command", required=True)
+    produce = commands.add_parser("produce", help="Split a bulk run into tasks")
+    produce.add_argument("-m", "--month", type=int, required=True, help="Month (1-12)")
+    produce.add_argument("-y", "--year", type=int, required=True, help="Year (e.g., 2025)")
+    produce.add_argument("--by-day", action="store_true", help="One task per employee and day instead of per month")
+    work = commands.add_parser("work", help="Pull and run tasks")
+    work.add_argument("--worker-id", help="Name of this worker (default: host:pid)")
+    work.add_argument("--exit-when-idle", action="store_true", help="Stop once no task is left")
+    report = commands.add_parser("report", help="Aggregated results of a batch")
+    report.add_argument("batch_id")
+    args = parser.parse_args()
+
+    config = load_config()
+    work_queue = WorkQueue(args.queue or config.get("queue_db", DEFAULT_QUEUE_PATH))
+
+    if args.command == "produce":
+        employees = [(employee.get("provider", "factorial"), employee["employee_id"])
+                     for employee in get_employee_configs(config)]
+        batch_id = work_queue.enqueue_bulk(employees, args.year, args.month, by_day=args.by_day)
+        print(f"Batch {batch_id} queued for {len(employees)} employee(s)")
+    elif args.command == "work":
+        try:
+            run_worker(work_queue, config, worker_id=args.worker_id, exit_when_idle=args.exit_when_idle)
+        except KeyboardInterrupt:
+            print("\nWorker interrupted; its lease will expire and the task will be retried")
+            sys.exit(0)
+    else:
+        print(json.dumps(work_queue.report(args.batch_id), indent=2))